@@ -8,8 +8,10 @@ from news.db import (
     set_schedule_delivery_time,
     get_scheduled_time,
 )
-from news.cache import get_cached_news, fetch_and_store_news
+from news.cache import get_news_swr, has_local_headlines, format_headline, INTERACTIVE_BUDGET
+from news.search import search, tokenize
 from news.db import NewsTopics
+from news.render import render_digest, sort_topics, split_message, MY_NEWS_STYLE
 
 
 # --- Keyboards ---
@@ -45,6 +47,21 @@ def get_settings_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+# --- Helpers ---
+
+async def send_messages(update: Update, context: ContextTypes.DEFAULT_TYPE, messages: list[str], reply_markup=None, **kwargs):
+    """
+    Sends already-split messages in order. A callback's message is replaced by
+    the first one, and the keyboard is attached to the last one.
+    """
+    for i, text in enumerate(messages):
+        markup = reply_markup if i == len(messages) - 1 else None
+        if i == 0 and update.callback_query:
+            await update.callback_query.edit_message_text(text, reply_markup=markup, **kwargs)
+        else:
+            await context.bot.send_message(update.effective_chat.id, text, reply_markup=markup, **kwargs)
+
+
 # --- Handlers ---
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -75,7 +92,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "• **My News**: Get headlines from your subscribed topics.\n"
         "• **Subscribe**: Choose topics you are interested in.\n"
         "• **Subscriptions**: Manage your active subscriptions.\n"
-        "• **Settings**: Set your daily news delivery time.\n\n"
+        "• **Settings**: Set your daily news delivery time.\n"
+        "• **Search**: Find recent stories by keyword, e.g. `/search elections`.\n\n"
         "You can also use commands like /news, /subscribe, etc."
     )
     
@@ -173,38 +191,17 @@ async def my_news(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
         return
 
-    # Show loading message if it's a callback
-    if update.callback_query:
+    # Only show a loading message when some topic isn't already in memory
+    if update.callback_query and not all(has_local_headlines(topic) for topic in sort_topics(topics)):
         await update.callback_query.edit_message_text("⌛ Fetching your personalized news...")
 
-    response = []
-    for topic_value in topics:
-        try:
-            topic = NewsTopics(topic_value)
-            headlines = await get_cached_news(topic)
-            if not headlines:
-                headlines = await fetch_and_store_news(topic)
-            if headlines:
-                response.append(f"📍 **{topic.name.title()}**\n" + "\n\n".join(headlines))
-        except ValueError:
-            continue
-            
-    if response:
-        final_text = "\n\n---\n\n".join(response)
-        # Split message if it's too long (Telegram limit is 4096)
-        if len(final_text) > 4000:
-            final_text = final_text[:3997] + "..."
-    else:
-        final_text = "No news available for your subscribed topics at the moment."
+    messages = await render_digest(topics, MY_NEWS_STYLE, INTERACTIVE_BUDGET)
+    if not messages:
+        messages = ["No news available for your subscribed topics at the moment."]
 
-    if update.message:
-        await update.message.reply_text(
-            final_text, reply_markup=get_back_to_menu_keyboard(), parse_mode="Markdown"
-        )
-    elif update.callback_query:
-        await update.callback_query.edit_message_text(
-            final_text, reply_markup=get_back_to_menu_keyboard(), parse_mode="Markdown"
-        )
+    await send_messages(
+        update, context, messages, reply_markup=get_back_to_menu_keyboard(), parse_mode="Markdown"
+    )
 
 
 async def settings_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -291,6 +288,30 @@ async def set_delivery_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Failed to update delivery time.")
 
 
+async def search_news(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = " ".join(context.args or [])
+    terms = tokenize(query)
+    if not terms:
+        await update.message.reply_text(
+            "🔎 Send some keywords to search recent stories, e.g. `/search elections`.", parse_mode="Markdown"
+        )
+        return
+
+    results = search(query)
+    if not results:
+        await update.message.reply_text(
+            f"No recent stories match '{' '.join(terms)}'.", reply_markup=get_back_to_menu_keyboard()
+        )
+        return
+
+    text = f"🔎 **Results for {' '.join(terms)}**\n\n" + "\n\n".join(
+        format_headline(title, url) for title, url in results
+    )
+    await send_messages(
+        update, context, split_message(text), reply_markup=get_back_to_menu_keyboard(), parse_mode="Markdown"
+    )
+
+
 async def get_delivery_time(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # This is handled by settings_menu now, but keeping it for the command
     await settings_menu(update, context)
@@ -337,16 +358,17 @@ async def button(update: Update, context: ContextTypes.DEFAULT_TYPE):
         topic_value = data.split(":", 1)[1]
         topic = NewsTopics(topic_value)
         
-        await query.edit_message_text(f"⌛ Fetching latest news for **{topic.name.title()}**...", parse_mode="Markdown")
-        
-        headlines = await get_cached_news(topic)
-        if not headlines:
-            headlines = await fetch_and_store_news(topic)
-            
+        # Only show a loading message when the answer isn't already in memory
+        if not has_local_headlines(topic):
+            await query.edit_message_text(f"⌛ Fetching latest news for **{topic.name.title()}**...", parse_mode="Markdown")
+
+        headlines = await get_news_swr(topic)
+
         if headlines:
             text = f"📰 **Latest {topic.name.title()} News**\n\n" + "\n\n".join(headlines)
-            if len(text) > 4000: text = text[:3997] + "..."
-            await query.edit_message_text(text, reply_markup=get_back_to_menu_keyboard(), parse_mode="Markdown")
+            await send_messages(
+                update, context, split_message(text), reply_markup=get_back_to_menu_keyboard(), parse_mode="Markdown"
+            )
         else:
             await query.edit_message_text(
                 f"No news available for '{topic.name}'.", 
@@ -1,7 +1,9 @@
 import os
 import asyncio
+import signal
 from aiohttp import web
 from telegram.ext import ApplicationBuilder, CommandHandler, CallbackQueryHandler
+from telegram.request import HTTPXRequest
 from handlers import (
     start,
     help_command,
@@ -12,10 +14,15 @@ from handlers import (
     set_delivery_time,
     get_delivery_time,
     settings_menu,
+    search_news,
     button,
 )
-from news.db import init_db
-from news.scheduler import setup_scheduler
+from news.db import init_db, close_db
+from news.api import open_session, close_session
+from news.scheduler import setup_scheduler, shutdown_scheduler
+from news import metrics, snapshot, tracing
+from webhook import UpdateQueue, WEBHOOK_PATH
+import profiler
 from dotenv import load_dotenv
 import logging
 
@@ -36,14 +43,44 @@ if not TELEGRAM_TOKEN:
 
 
 async def post_init(app):
+    # Warm caches from the last run before anything slow
+    snapshot.load()
+    await open_session()
     await init_db()
     await setup_scheduler(app)
 
 
+async def post_shutdown(app):
+    snapshot.save()
+    await shutdown_scheduler()
+    await close_session()
+    await close_db()
+
+
+def instrumented(callback):
+    """
+    Records the handler's latency in the /metrics handler histogram and traces
+    the update, logging a per-call breakdown when it is slow.
+    """
+    return tracing.traced(metrics.timed(metrics.HANDLER_SECONDS)(callback))
+
+
+class TracedRequest(HTTPXRequest):
+    """Bot API requests, each recorded as a span of the current update's trace."""
+
+    async def do_request(self, url, method, request_data=None, *args, **kwargs):
+        with tracing.span(f"telegram {url.rsplit('/', 1)[-1]}"):
+            return await super().do_request(url, method, request_data, *args, **kwargs)
+
+
 async def handle_ping(request):
     return web.Response(text="pong")
 
 
+async def handle_metrics(request):
+    return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+
 async def keep_alive(url):
     """Periodically pings the given URL to keep the service alive."""
     if not url:
@@ -51,17 +88,16 @@ async def keep_alive(url):
         return
 
     logging.info(f"Starting keep_alive task for {url}")
-    import aiohttp
 
-    async with aiohttp.ClientSession() as session:
-        while True:
-            try:
-                # Wait 14 minutes (Render timeout is 15min)
-                await asyncio.sleep(14 * 60)
-                async with session.get(f"{url}/ping") as response:
-                    logging.info(f"Self-ping status: {response.status}")
-            except Exception as e:
-                logging.error(f"Error in keep_alive: {e}")
+    while True:
+        try:
+            # Wait 14 minutes (Render timeout is 15min)
+            await asyncio.sleep(14 * 60)
+            session = await open_session()
+            async with session.get(f"{url}/ping") as response:
+                logging.info(f"Self-ping status: {response.status}")
+        except Exception as e:
+            logging.error(f"Error in keep_alive: {e}")
 
 
 def main():
@@ -70,35 +106,50 @@ def main():
         raise ValueError("No TELEGRAM_TOKEN found in environment variables")
 
     # Build the Telegram application
-    app = ApplicationBuilder().token(token).post_init(post_init).build()
-
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("help", help_command))
-    app.add_handler(CommandHandler("news", news))
-    app.add_handler(CommandHandler("subscribe", subscribe))
-    app.add_handler(CommandHandler("mynews", my_news))
-    app.add_handler(CommandHandler("mysubscriptions", my_subscriptions))
-    app.add_handler(CommandHandler("set_delivery_time", set_delivery_time))
-    app.add_handler(CommandHandler("get_delivery_time", get_delivery_time))
-    app.add_handler(CommandHandler("settings", settings_menu))
-
-    app.add_handler(CallbackQueryHandler(button))
+    app = (
+        ApplicationBuilder()
+        .token(token)
+        # Same pool size as the builder's default request
+        .request(TracedRequest(connection_pool_size=256))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .build()
+    )
+
+    app.add_handler(CommandHandler("start", instrumented(start)))
+    app.add_handler(CommandHandler("help", instrumented(help_command)))
+    app.add_handler(CommandHandler("news", instrumented(news)))
+    app.add_handler(CommandHandler("subscribe", instrumented(subscribe)))
+    app.add_handler(CommandHandler("mynews", instrumented(my_news)))
+    app.add_handler(CommandHandler("mysubscriptions", instrumented(my_subscriptions)))
+    app.add_handler(CommandHandler("set_delivery_time", instrumented(set_delivery_time)))
+    app.add_handler(CommandHandler("get_delivery_time", instrumented(get_delivery_time)))
+    app.add_handler(CommandHandler("settings", instrumented(settings_menu)))
+    app.add_handler(CommandHandler("search", instrumented(search_news)))
+
+    app.add_handler(CallbackQueryHandler(instrumented(button)))
 
     # Set up the web server for Render
     web_app = web.Application()
     web_app.router.add_get("/ping", handle_ping)
+    web_app.router.add_get("/metrics", handle_metrics)
+    if profiler.ADMIN_TOKEN:
+        web_app.router.add_get(profiler.PROFILE_PATH, profiler.handle)
 
     port = int(os.getenv("PORT", 8080))
     external_url = os.getenv("RENDER_EXTERNAL_URL")
+    # With WEBHOOK_URL set, Telegram pushes updates to this server instead of being polled
+    webhook_url = os.getenv("WEBHOOK_URL")
+    updates = None
+    if webhook_url:
+        updates = UpdateQueue(app, secret=os.getenv("WEBHOOK_SECRET"))
+        web_app.router.add_post(WEBHOOK_PATH, updates.handle)
 
     async def start_services():
-        # Start the Telegram bot in polling mode
         await app.initialize()
+        # post_init is only invoked by run_polling(), so call it ourselves
+        await post_init(app)
         await app.start()
-        await app.updater.start_polling()
-
-        # Start the keep_alive pinger
-        asyncio.create_task(keep_alive(external_url))
 
         # Start the web server
         runner = web.AppRunner(web_app)
@@ -107,14 +158,29 @@ def main():
         print(f"Web server started on port {port}")
         await site.start()
 
-        # Keep the loop running
+        if updates:
+            # The route is live, so Telegram can start pushing
+            await updates.start(webhook_url)
+        else:
+            await app.updater.start_polling()
+            # Incoming webhooks keep the service awake; polling needs the pinger
+            asyncio.create_task(keep_alive(external_url))
+        asyncio.create_task(metrics.monitor_event_loop())
+
+        # Run until interrupted; Render stops containers with SIGTERM
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            asyncio.get_running_loop().add_signal_handler(sig, stop.set)
         try:
-            while True:
-                await asyncio.sleep(3600)
+            await stop.wait()
         finally:
-            await app.updater.stop()
+            if updates:
+                await updates.stop()
+            else:
+                await app.updater.stop()
             await app.stop()
             await app.shutdown()
+            await post_shutdown(app)
 
     asyncio.run(start_services())
 
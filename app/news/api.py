@@ -1,17 +1,45 @@
 import os
 import aiohttp
 import logging
-from .db import NewsTopics
+from .models import Article, NewsTopics
+from . import quota, tracing
+from .metrics import GNEWS_REQUESTS
 
 LOGGER = logging.getLogger(__name__)
 NEWS_API_TOKEN = os.getenv("NEWS_API_TOKEN")
 ENDPOINT = "https://gnews.io/api/v4/search"
 
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", 20))
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=5)
+DNS_CACHE_TTL = 300
 
-async def fetch_news(topic: NewsTopics, max_articles=10) -> list[dict]:
+_session: aiohttp.ClientSession | None = None
+
+
+async def open_session() -> aiohttp.ClientSession:
+    """Returns the shared keep-alive session, creating it on first use."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(limit=HTTP_POOL_LIMIT, ttl_dns_cache=DNS_CACHE_TTL)
+        _session = aiohttp.ClientSession(connector=connector, timeout=HTTP_TIMEOUT)
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+async def fetch_news(topic: NewsTopics, max_articles=10) -> list[Article]:
     if not NEWS_API_TOKEN:
         LOGGER.error("NEWS_API_TOKEN not found.")
         return []
+    if not await quota.try_consume():
+        LOGGER.warning(f"GNews daily quota spent, not fetching {topic.value}.")
+        GNEWS_REQUESTS.inc(outcome="quota_spent")
+        return []
     params = {
         "q": topic.value,
         "lang": "en",
@@ -19,10 +47,15 @@ async def fetch_news(topic: NewsTopics, max_articles=10) -> list[dict]:
         "token": NEWS_API_TOKEN,
     }
     try:
-        async with aiohttp.ClientSession() as session:
+        session = await open_session()
+        with tracing.span(f"gnews {topic.value}"):
             async with session.get(ENDPOINT, params=params) as res:
                 res.raise_for_status()
-                return (await res.json()).get("articles", [])
+                payload = await res.json()
+        GNEWS_REQUESTS.inc(outcome="ok")
+        articles = (Article.from_gnews(data) for data in payload.get("articles", []))
+        return [article for article in articles if article]
     except Exception as e:
         LOGGER.error(f"Error fetching news for {topic.value}: {e}")
+        GNEWS_REQUESTS.inc(outcome="error")
         return []
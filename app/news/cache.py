@@ -1,74 +1,321 @@
+import asyncio
+import contextvars
+import os
+import time
 from datetime import datetime, timedelta
 import logging
-from .db import NewsTopics, supabase
+from cachetools import TTLCache
+from . import db
+from .db import NewsTopics
+from .models import Article
 from .api import fetch_news
+from . import search, similarity, tracing
+from . import metrics
+from .metrics import timed, STORAGE_SECONDS
 
 LOGGER = logging.getLogger(__name__)
 CACHE_DURATION = timedelta(hours=1)
+HEADLINE_CACHE_SIZE = 64
 
+# Rendered headline lists keyed by (topic, limit); cleared on every store_news
+_headline_cache: TTLCache = TTLCache(maxsize=HEADLINE_CACHE_SIZE, ttl=CACHE_DURATION.total_seconds())
+HEADLINE_CACHE_STATS = {"hits": 0, "misses": 0}
+# Bumped whenever a topic's stored headlines change
+_generations: dict[NewsTopics, int] = {}
 
-async def store_news(topic: NewsTopics, articles: list[dict]):
-    if not supabase:
-        LOGGER.error("Supabase client not initialized.")
+# Last non-empty headline lists, served while a refresh runs in the background
+_last_good: dict[tuple[NewsTopics, int], list[str]] = {}
+# Longest an interactive request waits when there is nothing to serve
+INTERACTIVE_BUDGET = 2.0
+
+# In-flight GNews fetches, one per topic, shared by concurrent callers
+_inflight: dict[NewsTopics, asyncio.Task] = {}
+_revalidating: dict[NewsTopics, asyncio.Task] = {}
+SINGLE_FLIGHT_STATS = {"fetches": 0, "coalesced": 0}
+
+metrics.Counter(
+    "newsworthy_headline_cache_total", "Headline cache lookups by result.", ("result",),
+    callback=lambda: {(result,): count for result, count in HEADLINE_CACHE_STATS.items()},
+)
+metrics.Counter(
+    "newsworthy_single_flight_total", "GNews fetches started versus joined by a concurrent caller.", ("result",),
+    callback=lambda: {(result,): count for result, count in SINGLE_FLIGHT_STATS.items()},
+)
+
+# (topic, url hash) -> when it was last stored, to skip re-inserting known articles
+_seen_urls: dict[tuple[str, int], float] = {}
+SEEN_URLS_WINDOW = timedelta(days=2)
+
+# Retention for the news table; 0 disables a rule
+RETENTION_DAYS = int(os.getenv("NEWS_RETENTION_DAYS", 7))
+RETENTION_PER_TOPIC = int(os.getenv("NEWS_RETENTION_PER_TOPIC", 200))
+RETENTION_BATCH = 500
+RETENTION_MAX_BATCHES = 20
+
+
+def _forget_old_urls():
+    cutoff = time.monotonic() - SEEN_URLS_WINDOW.total_seconds()
+    for key in [key for key, seen in _seen_urls.items() if seen < cutoff]:
+        del _seen_urls[key]
+
+
+@timed(STORAGE_SECONDS)
+async def store_news(topic: NewsTopics, articles: list[Article]):
+    """
+    Stores fetched articles, skipping URLs already stored for the topic.
+    Known articles only get their fetched_at bumped so get_last_fetch_time
+    still reflects the refresh.
+    """
+    if not db.backend:
+        LOGGER.error("Storage backend not initialized.")
         return
     try:
+        _forget_old_urls()
         fetched_at = datetime.now().isoformat()
-        rows = []
+        by_url: dict[str, Article] = {}
         for article in articles:
-            rows.append({
-                "title": article.get("title"),
-                "content": article.get("content"),
-                "url": article.get("url"),
-                "published_at": article.get("publishedAt"),
-                "topic": topic.value,
-                "fetched_at": fetched_at,
-            })
+            by_url.setdefault(article.url, article)
+        # Only ask the database about URLs we haven't seen recently
+        unknown = {url for url in by_url if (topic.value, similarity.url_key(url)) not in _seen_urls}
+        stored = await db.backend.find_news_urls(topic.value, list(unknown)) if unknown else set()
+        known = [url for url in by_url if url not in unknown or url in stored]
+
+        rows = [article.to_row(topic.value, fetched_at) for url, article in by_url.items() if url not in known]
+        if known:
+            await db.backend.touch_news(topic.value, known, fetched_at)
         if rows:
-            supabase.table("news").insert(rows).execute()
+            await db.backend.insert_news(rows)
+            invalidate_headlines(topic)
+        now = time.monotonic()
+        for url, article in by_url.items():
+            _seen_urls[(topic.value, similarity.url_key(url))] = now
+            similarity.add_article(url, article.title, article.content)
+            search.add_article(url, article.title, article.content, topic.value, article.published_at)
+        LOGGER.info(f"Stored {len(rows)} new articles for {topic.value}, {len(known)} already known.")
     except Exception as e:
         LOGGER.error(f"Error storing news: {e}")
 
 
+@timed(STORAGE_SECONDS)
 async def get_last_fetch_time(topic: NewsTopics) -> datetime | None:
-    if not supabase:
+    if not db.backend:
         return None
     try:
-        response = (
-            supabase.table("news")
-            .select("fetched_at")
-            .eq("topic", topic.value)
-            .order("fetched_at", desc=True)
-            .limit(1)
-            .execute()
-        )
-        if response.data:
-            return datetime.fromisoformat(response.data[0]["fetched_at"])
-        return None
+        return await db.backend.get_last_fetch_time(topic.value)
     except Exception as e:
         LOGGER.error(f"Error getting last fetch time for {topic.value}: {e}")
         return None
 
 
+async def _delete_older_than(cutoff: datetime) -> int:
+    deleted = 0
+    for _ in range(RETENTION_MAX_BATCHES):
+        batch = await db.backend.delete_news_older_than(cutoff, RETENTION_BATCH)
+        deleted += batch
+        if batch < RETENTION_BATCH:
+            break
+    return deleted
+
+
+async def _delete_beyond(topic: NewsTopics, keep: int) -> int:
+    deleted = 0
+    for _ in range(RETENTION_MAX_BATCHES):
+        batch = await db.backend.delete_news_beyond(topic.value, keep, RETENTION_BATCH)
+        deleted += batch
+        if batch < RETENTION_BATCH:
+            break
+    return deleted
+
+
+@timed(STORAGE_SECONDS)
+async def compact_news(retention_days: int = RETENTION_DAYS, keep_per_topic: int = RETENTION_PER_TOPIC) -> int:
+    """
+    Deletes articles fetched more than retention_days ago and, per topic,
+    all but the newest keep_per_topic, in bounded batches.
+    Returns the number of rows deleted.
+    """
+    if not db.backend:
+        LOGGER.error("Storage backend not initialized.")
+        return 0
+    deleted = 0
+    try:
+        if retention_days:
+            deleted += await _delete_older_than(datetime.now() - timedelta(days=retention_days))
+        if keep_per_topic:
+            for topic in NewsTopics:
+                deleted += await _delete_beyond(topic, keep_per_topic)
+    except Exception as e:
+        LOGGER.error(f"Error compacting news: {e}")
+    if deleted:
+        for topic in NewsTopics:
+            invalidate_headlines(topic)
+    LOGGER.info(f"News compaction reclaimed {deleted} rows.")
+    return deleted
+
+
+async def load_indexes():
+    """Rebuilds the search and near-duplicate indexes from the newest stored articles in one read."""
+    if not db.backend:
+        return
+    try:
+        rows = await db.backend.get_recent_news(search.MAX_DOCS)
+    except Exception as e:
+        LOGGER.error(f"Error loading the article indexes: {e}")
+        return
+    search.rebuild(rows)
+    similarity.rebuild(rows)
+
+
+def format_headline(title: str, url: str) -> str:
+    return f"• {title}\n{url}"
+
+
+def headline_url(headline: str) -> str:
+    return headline.rsplit("\n", 1)[-1]
+
+
+def get_generation(topic: NewsTopics) -> int:
+    return _generations.get(topic, 0)
+
+
+def invalidate_headlines(topic: NewsTopics):
+    _generations[topic] = get_generation(topic) + 1
+    for key in [key for key in _headline_cache if key[0] == topic]:
+        _headline_cache.pop(key, None)
+
+
+@timed(STORAGE_SECONDS)
 async def get_cached_news(topic: NewsTopics, limit=10) -> list[str]:
-    if not supabase:
-        LOGGER.error("Supabase client not initialized.")
+    cached = _headline_cache.get((topic, limit))
+    if cached is not None:
+        HEADLINE_CACHE_STATS["hits"] += 1
+        return list(cached)
+    HEADLINE_CACHE_STATS["misses"] += 1
+    generation = get_generation(topic)
+    if not db.backend:
+        LOGGER.error("Storage backend not initialized.")
         return []
     try:
-        response = supabase.table("news") \
-            .select("title, url") \
-            .eq("topic", topic.value) \
-            .order("published_at", desc=True) \
-            .limit(limit) \
-            .execute()
-        return [f"• {row['title']}\n{row['url']}" for row in response.data]
+        # Over-fetch so duplicate rows stored before dedup don't shorten the list
+        rows = await db.backend.get_latest_news(topic.value, limit * 2)
+        urls = set()
+        headlines = []
+        for row in rows:
+            if row["url"] in urls:
+                continue
+            urls.add(row["url"])
+            headlines.append(format_headline(row["title"], row["url"]))
+        headlines = headlines[:limit]
+        # Don't cache a read that raced with a store_news for this topic
+        if headlines and generation == get_generation(topic):
+            if _last_good.get((topic, limit), headlines) != headlines:
+                # Blocks rendered from the replaced list (say, one restored from a snapshot) are stale
+                _generations[topic] = generation + 1
+            _headline_cache[(topic, limit)] = headlines
+            _last_good[(topic, limit)] = headlines
+        return list(headlines)
     except Exception as e:
         LOGGER.error(f"Error getting cached news: {e}")
         return []
 
 
-async def fetch_and_store_news(topic: NewsTopics) -> list[str]:
+def export_headlines() -> list[tuple[str, int, list[str]]]:
+    """Every headline list held in memory, for snapshots."""
+    lists = {**_last_good, **dict(_headline_cache.items())}
+    return [(topic.value, limit, list(headlines)) for (topic, limit), headlines in lists.items()]
+
+
+def restore_headlines(entries: list[tuple[str, int, list[str]]]):
+    """
+    Seeds the last known good lists from a snapshot. They are served as stale,
+    so the first read also triggers a refresh.
+    """
+    for topic_value, limit, headlines in entries:
+        if headlines:
+            _last_good.setdefault((NewsTopics(topic_value), limit), list(headlines))
+
+
+async def _fetch_and_store(topic: NewsTopics) -> list[str]:
     articles = await fetch_news(topic)
     if articles:
         await store_news(topic, articles)
-        return [f"• {a['title']}\n{a['url']}" for a in articles]
+        headlines = [format_headline(article.title, article.url) for article in articles]
+        _last_good[(topic, 10)] = headlines
+        return list(headlines)
     return []
+
+
+def _single_flight(tasks: dict[NewsTopics, asyncio.Task], topic: NewsTopics, factory) -> tuple[asyncio.Task, bool]:
+    """
+    Returns the running task for topic, starting one if needed, and whether it
+    is new. The task runs in an empty context: it is shared by every caller, so
+    its spans must not land in the trace of whichever update happened to start it.
+    """
+    task = tasks.get(topic)
+    if task is not None:
+        return task, False
+    task = asyncio.create_task(factory(topic), context=contextvars.Context())
+    tasks[topic] = task
+
+    def _forget(done: asyncio.Task):
+        if tasks.get(topic) is done:
+            del tasks[topic]
+
+    task.add_done_callback(_forget)
+    return task, True
+
+
+@timed(STORAGE_SECONDS)
+async def fetch_and_store_news(topic: NewsTopics) -> list[str]:
+    """
+    Fetches and stores fresh headlines for a topic.
+    Concurrent calls for the same topic wait on a single GNews request.
+    """
+    task, started = _single_flight(_inflight, topic, _fetch_and_store)
+    if started:
+        SINGLE_FLIGHT_STATS["fetches"] += 1
+    else:
+        SINGLE_FLIGHT_STATS["coalesced"] += 1
+    # Shield so one cancelled caller doesn't abort the fetch for everyone else
+    with tracing.span(f"single-flight gnews {topic.value}"):
+        return list(await asyncio.shield(task))
+
+
+def get_single_flight_stats() -> dict:
+    return dict(SINGLE_FLIGHT_STATS)
+
+
+async def _revalidate(topic: NewsTopics) -> list[str]:
+    headlines = await get_cached_news(topic)
+    if not headlines:
+        headlines = await fetch_and_store_news(topic)
+    return headlines
+
+
+def has_local_headlines(topic: NewsTopics, limit=10) -> bool:
+    return (topic, limit) in _headline_cache or (topic, limit) in _last_good
+
+
+async def get_news_swr(topic: NewsTopics, budget: float | None = INTERACTIVE_BUDGET) -> list[str]:
+    """
+    Stale-while-revalidate read. Fresh cached headlines are returned as is;
+    otherwise the last known good set is returned at once while a background
+    refresh runs. With nothing to serve, waits up to budget seconds for the
+    refresh and returns [] if it doesn't finish. Without a budget (scheduled
+    digests) it always waits, so stored news is never delivered stale.
+    """
+    cached = _headline_cache.get((topic, 10))
+    if cached is not None:
+        HEADLINE_CACHE_STATS["hits"] += 1
+        return list(cached)
+    task, _ = _single_flight(_revalidating, topic, _revalidate)
+    stale = _last_good.get((topic, 10))
+    if stale and budget is not None:
+        return list(stale)
+    try:
+        # A failed refresh still leaves the stale list to deliver
+        with tracing.span(f"single-flight revalidate {topic.value}"):
+            return list(await asyncio.wait_for(asyncio.shield(task), budget) or stale or [])
+    except asyncio.TimeoutError:
+        LOGGER.warning(f"No headlines for {topic.value} within {budget}s, refresh continues in background.")
+        return []
@@ -0,0 +1,115 @@
+"""
+Coordination between bot replicas sharing one storage backend.
+
+Each replica heartbeats into the replicas table. Users are split across the
+live replicas on a consistent-hash ring, so when one dies only its users move.
+Jobs that must run once per cluster (news refresh, compaction) are guarded by
+leases. Without a storage backend the process acts as the only replica.
+"""
+import functools
+import logging
+import os
+import secrets
+import socket
+from bisect import bisect
+from datetime import datetime, timedelta, timezone
+import mmh3
+from . import db, metrics
+
+LOGGER = logging.getLogger(__name__)
+
+REPLICA_ID = os.getenv("REPLICA_ID") or f"{socket.gethostname()}-{os.getpid()}-{secrets.token_hex(3)}"
+HEARTBEAT_SECONDS = 15
+# A replica missing this long is dropped and its users rebalanced
+REPLICA_TIMEOUT = timedelta(seconds=45)
+# Points per replica on the hash ring; more points even out the split
+VIRTUAL_NODES = 128
+
+_replicas: list[str] = [REPLICA_ID]
+_ring: list[tuple[int, str]] = []
+
+metrics.Gauge(
+    "newsworthy_live_replicas", "Replicas currently sharing delivery.", callback=lambda: {(): len(_replicas)}
+)
+
+
+def build_ring(replicas: list[str]) -> list[tuple[int, str]]:
+    return sorted((mmh3.hash(f"{replica}#{i}"), replica) for replica in replicas for i in range(VIRTUAL_NODES))
+
+
+def owner(ring: list[tuple[int, str]], user_id: int) -> str:
+    index = bisect(ring, (mmh3.hash(str(user_id)), "")) % len(ring)
+    return ring[index][1]
+
+
+def owns(user_id: int) -> bool:
+    """Whether this replica delivers to user_id."""
+    if len(_replicas) == 1:
+        return True
+    return owner(_ring, user_id) == REPLICA_ID
+
+
+def replicas() -> list[str]:
+    return list(_replicas)
+
+
+def _set_replicas(live: list[str]):
+    global _replicas, _ring
+    live = sorted(set(live) | {REPLICA_ID})
+    if live != _replicas:
+        LOGGER.info(f"Replica set changed: {len(live)} live ({', '.join(live)})")
+        _replicas = live
+        _ring = build_ring(live)
+
+
+async def heartbeat():
+    """Records this replica as alive and refreshes the view of the others."""
+    if not db.backend:
+        return
+    now = datetime.now(timezone.utc)
+    try:
+        await db.backend.heartbeat(REPLICA_ID, now)
+        _set_replicas(await db.backend.get_live_replicas(now - REPLICA_TIMEOUT))
+    except Exception as e:
+        # Keep the last known split rather than grabbing every user
+        LOGGER.error(f"Replica heartbeat failed: {e}")
+
+
+async def hold_lease(name: str, ttl: timedelta) -> bool:
+    """Takes or renews the named lease; False if another replica holds it."""
+    if not db.backend:
+        return True
+    now = datetime.now(timezone.utc)
+    try:
+        return await db.backend.acquire_lease(name, REPLICA_ID, now + ttl, now)
+    except Exception as e:
+        LOGGER.error(f"Error acquiring lease {name}: {e}")
+        return False
+
+
+def leased(name: str, ttl: timedelta):
+    """Runs the decorated job only on the replica holding the named lease."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not await hold_lease(name, ttl):
+                LOGGER.debug(f"Skipping {func.__name__}: lease {name} is held elsewhere")
+                return None
+            return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+async def leave(*leases: str):
+    """Drops this replica and its leases so the others take over right away."""
+    if not db.backend:
+        return
+    try:
+        for name in leases:
+            await db.backend.release_lease(name, REPLICA_ID)
+        await db.backend.remove_replica(REPLICA_ID)
+    except Exception as e:
+        LOGGER.error(f"Error leaving the replica set: {e}")
@@ -1,113 +1,209 @@
 import logging
 import os
-from enum import Enum
+from cachetools import TTLCache
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from .storage import StorageBackend, create_backend
+from .models import NewsTopics  # re-exported; most modules import it from here
+from . import timetable
+from . import metrics
+from .metrics import timed, STORAGE_SECONDS
 
 load_dotenv()
 
 LOGGER = logging.getLogger(__name__)
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+# Created in init_db(), selected by the STORAGE_BACKEND environment variable
+backend: StorageBackend | None = None
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    LOGGER.warning("SUPABASE_URL or SUPABASE_KEY not found in environment variables.")
+# Per-user profiles ({"username", "topics", "delivery_time"}, each loaded on demand), LRU
+# bounded and updated by this module's writes. The TTL only bounds staleness
+# from changes made outside this process.
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", 10000))
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", 300))
+_profiles: TTLCache = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+PROFILE_CACHE_STATS = {"hits": 0, "misses": 0}
+# Bumped by every profile write; a read that overlapped one isn't cached
+_profile_epoch = 0
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABASE_KEY else None
-
-
-class NewsTopics(Enum):
-    GENERAL = "general"
-    WORLD = "world"
-    NATION = "nation"
-    BUSINESS = "business"
-    TECHNOLOGY = "technology"
-    ENTERTAINMENT = "entertainment"
-    SPORTS = "sports"
-    SCIENCE = "science"
-    HEALTH = "health"
+metrics.Counter(
+    "newsworthy_profile_cache_total", "User profile cache lookups by result.", ("result",),
+    callback=lambda: {(result,): count for result, count in PROFILE_CACHE_STATS.items()},
+)
 
 
 async def init_db():
     """
-    Supabase schema is managed via the Supabase dashboard.
-    This function remains for compatibility but doesn't perform SQL execution.
+    Connects the configured storage backend. The Supabase schema is managed
+    via the Supabase dashboard; the SQLite backend creates its own.
     """
-    if not supabase:
-        LOGGER.error("Supabase client not initialized.")
+    global backend
+    backend = create_backend()
+    if not backend:
+        LOGGER.error("Storage backend not configured: SUPABASE_URL or SUPABASE_KEY not found.")
+        return
+    await backend.connect()
+    LOGGER.info(f"{type(backend).__name__} initialized.")
+
+
+async def close_db():
+    global backend
+    if backend:
+        await backend.close()
+    backend = None
+    _profiles.clear()
+
+
+def _bump_profile_epoch():
+    global _profile_epoch
+    _profile_epoch += 1
+
+
+def _cached(user_id: int, field: str):
+    """Returns (hit, value) for one profile field."""
+    profile = _profiles.get(user_id)
+    if profile is not None and field in profile:
+        PROFILE_CACHE_STATS["hits"] += 1
+        return True, profile[field]
+    PROFILE_CACHE_STATS["misses"] += 1
+    return False, None
+
+
+def _remember(user_id: int, field: str, value, epoch: int):
+    if epoch != _profile_epoch:
         return
-    LOGGER.info("Supabase client initialized.")
+    profile = _profiles.get(user_id)
+    if profile is None:
+        profile = _profiles[user_id] = {}
+    profile[field] = value
 
 
+@timed(STORAGE_SECONDS)
 async def save_user(user) -> bool:
+    # /start runs on every "main menu" tap; skip the upsert if nothing changed
+    hit, username = _cached(user.id, "username")
+    if hit and username == user.username:
+        return True
+    epoch = _profile_epoch
     try:
-        data = {
-            "user_id": user.id,
-            "username": user.username,
-        }
-        # upsert with ignore-like behavior (Supabase upsert by default updates but we can use it to ensure user exists)
-        supabase.table("users").upsert(data, on_conflict="user_id").execute()
+        await backend.upsert_user(user.id, user.username)
+        _remember(user.id, "username", user.username, epoch)
         return True
     except Exception as e:
         LOGGER.error(f"Error saving user {user.id}: {e}")
         return False
 
 
+@timed(STORAGE_SECONDS)
 async def fetch_my_subscriptions(user_id: int) -> list[str]:
+    hit, topics = _cached(user_id, "topics")
+    if hit:
+        return list(topics)
+    epoch = _profile_epoch
     try:
-        response = supabase.table("subscriptions").select("topic").eq("user_id", user_id).execute()
-        return [row["topic"] for row in response.data]
+        topics = await backend.get_subscriptions(user_id)
+        _remember(user_id, "topics", list(topics), epoch)
+        return topics
     except Exception as e:
         LOGGER.error(f"Error fetching subscriptions for {user_id}: {e}")
         return []
 
 
+@timed(STORAGE_SECONDS)
 async def subscribe_to_topic(topic: NewsTopics, user_id: int) -> bool:
     try:
-        data = {"user_id": user_id, "topic": topic.value}
-        supabase.table("subscriptions").upsert(data, on_conflict="user_id,topic").execute()
+        await backend.add_subscription(user_id, topic.value)
+        _bump_profile_epoch()
+        timetable.add_subscription(user_id, topic.value)
+        topics = _profiles.get(user_id, {}).get("topics")
+        if topics is not None and topic.value not in topics:
+            topics.append(topic.value)
         return True
     except Exception as e:
         LOGGER.error(f"Error subscribing to topic {topic.value} for {user_id}: {e}")
         return False
 
 
+@timed(STORAGE_SECONDS)
 async def unsubscribe_from_topic(user_id: int, topic: str) -> bool:
     try:
-        supabase.table("subscriptions").delete().eq("user_id", user_id).eq("topic", topic).execute()
+        await backend.remove_subscription(user_id, topic)
+        _bump_profile_epoch()
+        timetable.remove_subscription(user_id, topic)
+        topics = _profiles.get(user_id, {}).get("topics")
+        if topics is not None and topic in topics:
+            topics.remove(topic)
         return True
     except Exception as e:
         LOGGER.error(f"Error unsubscribing from topic {topic} for {user_id}: {e}")
         return False
 
 
+@timed(STORAGE_SECONDS)
 async def set_schedule_delivery_time(user_id: int, hour: int, minute: int) -> bool:
     try:
-        data = {"delivery_hour": hour, "delivery_minute": minute}
-        supabase.table("users").update(data).eq("user_id", user_id).execute()
+        await backend.set_delivery_time(user_id, hour, minute)
+        _bump_profile_epoch()
+        timetable.set_delivery_time(user_id, hour, minute)
+        profile = _profiles.get(user_id)
+        if profile is not None:
+            # The write is a no-op for unknown users, so only update a known row
+            if profile.get("delivery_time") is not None:
+                profile["delivery_time"] = (hour, minute)
+            else:
+                profile.pop("delivery_time", None)
         return True
     except Exception as e:
         LOGGER.error(f"Error setting schedule for {user_id}: {e}")
         return False
 
 
+@timed(STORAGE_SECONDS)
 async def get_scheduled_time(user_id: int):
+    hit, delivery_time = _cached(user_id, "delivery_time")
+    if hit:
+        return delivery_time
+    epoch = _profile_epoch
     try:
-        response = supabase.table("users").select("delivery_hour, delivery_minute").eq("user_id", user_id).execute()
-        if response.data:
-            row = response.data[0]
-            return (row["delivery_hour"], row["delivery_minute"])
-        return None
+        delivery_time = await backend.get_delivery_time(user_id)
+        _remember(user_id, "delivery_time", delivery_time, epoch)
+        return delivery_time
     except Exception as e:
         LOGGER.error(f"Error getting scheduled time for {user_id}: {e}")
         return None
 
 
+@timed(STORAGE_SECONDS)
 async def get_users_by_delivery_time(hour: int, minute: int) -> list[int]:
     try:
-        response = supabase.table("users").select("user_id").eq("delivery_hour", hour).eq("delivery_minute", minute).execute()
-        return [row["user_id"] for row in response.data]
+        return await backend.get_users_by_delivery_time(hour, minute)
     except Exception as e:
         LOGGER.error(f"Error fetching users by delivery time: {e}")
         return []
+
+
+@timed(STORAGE_SECONDS)
+async def get_all_delivery_times() -> dict[int, tuple[int, int]] | None:
+    try:
+        return await backend.get_all_delivery_times()
+    except Exception as e:
+        LOGGER.error(f"Error fetching delivery times: {e}")
+        return None
+
+
+@timed(STORAGE_SECONDS)
+async def get_all_subscriptions() -> dict[int, set[str]] | None:
+    try:
+        return await backend.get_all_subscriptions()
+    except Exception as e:
+        LOGGER.error(f"Error fetching subscriptions: {e}")
+        return None
+
+
+@timed(STORAGE_SECONDS)
+async def get_api_usage(day: str) -> int | None:
+    """Requests recorded against the GNews quota on day (YYYY-MM-DD, UTC)."""
+    try:
+        return await backend.get_api_usage(day)
+    except Exception as e:
+        LOGGER.error(f"Error fetching API usage for {day}: {e}")
+        return None
@@ -0,0 +1,151 @@
+"""
+Concurrent delivery of scheduled digests within Telegram's flood limits:
+about 30 messages/second per bot and one message/second per chat.
+"""
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from telegram.error import RetryAfter, TimedOut, NetworkError, TelegramError
+from . import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+GLOBAL_RATE = float(os.getenv("DELIVERY_GLOBAL_RATE", 30))
+PER_CHAT_INTERVAL = 1.0
+DELIVERY_WORKERS = int(os.getenv("DELIVERY_WORKERS", 32))
+MAX_ATTEMPTS = 4
+
+DELIVERED_MESSAGES = metrics.Counter(
+    "newsworthy_delivered_messages_total", "Scheduled digest messages by outcome.", ("outcome",)
+)
+
+
+class TokenBucket:
+    """Async token bucket; pause() blocks everyone, e.g. after a RetryAfter."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+        # Refill from the end of the pause, so no full burst goes out when it ends
+        self.updated = self.paused_until
+
+
+@dataclass
+class DeliveryStats:
+    chats: int = 0
+    sent: int = 0
+    failed: int = 0
+    retries: int = 0
+    duration: float = 0.0
+    lag: float = 0.0
+    # chat_id -> messages delivered before its send failed
+    failed_chats: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.duration if self.duration else 0.0
+
+
+def _seconds(value) -> float:
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+async def _send(bot, bucket: TokenBucket, chat_id: int, text: str, stats: DeliveryStats, **kwargs) -> bool:
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await bucket.acquire()
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, **kwargs)
+            return True
+        except RetryAfter as e:
+            # Flood control applies to the whole bot, so stall every worker
+            delay = _seconds(e.retry_after)
+            LOGGER.warning(f"Flood limit hit sending to {chat_id}, retrying in {delay}s")
+            bucket.pause(delay)
+        except (TimedOut, NetworkError) as e:
+            if attempt == MAX_ATTEMPTS:
+                LOGGER.error(f"Failed to send news to {chat_id}: {e}")
+                return False
+            await asyncio.sleep(attempt)
+        except TelegramError as e:
+            # Blocked bot, deleted chat, bad request: retrying won't help
+            LOGGER.error(f"Failed to send news to {chat_id}: {e}")
+            return False
+        stats.retries += 1
+    LOGGER.error(f"Giving up sending news to {chat_id} after {MAX_ATTEMPTS} attempts")
+    return False
+
+
+async def deliver(bot, payloads: dict[int, list[str]], slot: datetime | None = None, **kwargs) -> DeliveryStats:
+    """
+    Sends each chat its messages, in order, using a bounded pool of workers.
+    Extra keyword arguments are passed through to bot.send_message.
+    """
+    stats = DeliveryStats(chats=len(payloads))
+    if not payloads:
+        return stats
+    started = time.monotonic()
+    bucket = TokenBucket(GLOBAL_RATE)
+    queue: asyncio.Queue = asyncio.Queue()
+    for chat_id, messages in payloads.items():
+        queue.put_nowait((chat_id, messages))
+
+    async def worker():
+        while True:
+            try:
+                chat_id, messages = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            last_sent = 0.0
+            delivered = 0
+            for text in messages:
+                wait = last_sent + PER_CHAT_INTERVAL - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                if await _send(bot, bucket, chat_id, text, stats, **kwargs):
+                    stats.sent += 1
+                    delivered += 1
+                    last_sent = time.monotonic()
+                else:
+                    stats.failed += 1
+                    stats.failed_chats[chat_id] = delivered
+                    break
+
+    await asyncio.gather(*(worker() for _ in range(min(DELIVERY_WORKERS, len(payloads)))))
+
+    stats.duration = time.monotonic() - started
+    if slot is not None:
+        stats.lag = max(0.0, (datetime.now() - slot).total_seconds())
+        metrics.DELIVERY_LAG_SECONDS.set(stats.lag)
+    DELIVERED_MESSAGES.inc(stats.sent, outcome="sent")
+    DELIVERED_MESSAGES.inc(stats.failed, outcome="failed")
+    LOGGER.info(
+        f"Delivered {stats.sent} messages to {stats.chats} chats in {stats.duration:.1f}s "
+        f"({stats.throughput:.1f} msg/s, {stats.failed} failed, {stats.retries} retries, "
+        f"finished {stats.lag:.1f}s after slot)"
+    )
+    return stats
@@ -0,0 +1,175 @@
+"""
+Minimal Prometheus-style metrics, rendered in the text exposition format by
+the /metrics route. Updates are plain dict operations, cheap enough to leave
+on in production.
+"""
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from . import tracing
+
+REGISTRY: list["Metric"] = []
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), callback=None):
+        """callback, if given, returns {label values tuple: value} at scrape time."""
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.callback = callback
+        self.values: dict[tuple, float] = {}
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self):
+        values = self.callback() if self.callback else self.values
+        for key, value in values.items():
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        self.values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+        # label key -> [per-bucket counts (last is +Inf), sum, count]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def samples(self):
+        for key, (counts, total, count) in self.series.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+
+def timed(histogram: Histogram):
+    """
+    Times an async function into histogram, labelled with the function's name,
+    and as a span of the current update's trace.
+    """
+    label = histogram.labelnames[0]
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with tracing.span(func.__name__):
+                    return await func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, **{label: func.__name__})
+
+        return wrapper
+
+    return decorator
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HANDLER_SECONDS = Histogram(
+    "newsworthy_handler_seconds", "Time spent in Telegram update handlers.", ("handler",)
+)
+STORAGE_SECONDS = Histogram(
+    "newsworthy_storage_seconds", "Time spent in news.db and news.cache calls.", ("function",)
+)
+GNEWS_REQUESTS = Counter(
+    "newsworthy_gnews_requests_total", "GNews API calls by outcome.", ("outcome",)
+)
+SCHEDULER_RUN_SECONDS = Gauge(
+    "newsworthy_scheduler_run_seconds", "Duration of the last run of each scheduled job.", ("job",)
+)
+DELIVERY_LAG_SECONDS = Gauge(
+    "newsworthy_delivery_lag_seconds", "How long after its slot the last delivery run finished."
+)
+EVENT_LOOP_LAG_SECONDS = Gauge(
+    "newsworthy_event_loop_lag_seconds", "How late a periodic wake-up on the event loop fired."
+)
+
+
+def timed_job(func):
+    """Records a scheduled job's last run duration."""
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            SCHEDULER_RUN_SECONDS.set(time.perf_counter() - started, job=func.__name__)
+
+    return wrapper
+
+
+async def monitor_event_loop(interval: float = 1.0):
+    """Measures event-loop lag as the overshoot of a fixed sleep."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG_SECONDS.set(max(0.0, loop.time() - started - interval))
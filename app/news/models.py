@@ -1,12 +1,40 @@
+from dataclasses import dataclass
 from enum import Enum
 
+
 class NewsTopics(Enum):
-    GENERAL = 'general'
-    WORLD = 'world'
-    NATION = 'nation'
-    BUSINESS = 'business'
-    TECHNOLOGY = 'technology'
-    ENTERTAINMENT = 'entertainment'
-    SPORTS = 'sports'
-    SCIENCE = 'science'
-    HEALTH = 'health'
+    GENERAL = "general"
+    WORLD = "world"
+    NATION = "nation"
+    BUSINESS = "business"
+    TECHNOLOGY = "technology"
+    ENTERTAINMENT = "entertainment"
+    SPORTS = "sports"
+    SCIENCE = "science"
+    HEALTH = "health"
+
+
+@dataclass(slots=True, frozen=True)
+class Article:
+    """One fetched article, with only the GNews fields the bot uses."""
+    title: str
+    url: str
+    content: str | None = None
+    published_at: str | None = None
+
+    @classmethod
+    def from_gnews(cls, data: dict) -> "Article | None":
+        url = data.get("url")
+        if not url:
+            return None
+        return cls(data.get("title") or url, url, data.get("content"), data.get("publishedAt"))
+
+    def to_row(self, topic: str, fetched_at: str) -> dict:
+        return {
+            "title": self.title,
+            "content": self.content,
+            "url": self.url,
+            "published_at": self.published_at,
+            "topic": topic,
+            "fetched_at": fetched_at,
+        }
@@ -0,0 +1,152 @@
+"""
+Durable delivery outbox. Every scheduled digest is a (user, slot) row: one
+replica queues the rows for each minute, starting from a stored checkpoint,
+and every replica sends the pending rows of the users it owns. A row is marked
+sent once Telegram has accepted all of its messages, and a digest that failed
+partway records how many went out so a retry resumes after them. So a stall,
+a restart or a slow send delays a delivery instead of losing it. A message is
+only sent twice if the process dies between sending it and marking the row.
+"""
+import logging
+from datetime import datetime, timedelta
+from . import coordination, db, metrics, timetable
+from .delivery import deliver
+
+LOGGER = logging.getLogger(__name__)
+
+CHECKPOINT = "delivery_queued"
+MINUTE = timedelta(minutes=1)
+# Slots further back are not caught up: a digest that late is stale news
+MAX_CATCH_UP = timedelta(hours=2)
+# Pending rows read (and delivered) per round trip
+BATCH_SIZE = 500
+# Failed sends are retried on later ticks, up to this many in total
+MAX_ATTEMPTS = 3
+RETENTION = timedelta(days=7)
+PRUNE_BATCH = 5000
+PRUNE_MAX_BATCHES = 20
+
+OUTBOX_ROWS = metrics.Counter("newsworthy_outbox_rows_total", "Delivery outbox rows by outcome.", ("outcome",))
+
+
+async def _recipients(slot: datetime) -> list[int]:
+    if timetable.is_loaded():
+        return timetable.users_at(slot.hour, slot.minute)
+    # Straight to the backend: an error must not pass for an empty slot
+    return await db.backend.get_users_by_delivery_time(slot.hour, slot.minute)
+
+
+async def enqueue_due(now: datetime) -> int:
+    """
+    Queues every slot after the checkpoint up to now (at most MAX_CATCH_UP
+    back) and returns how many rows were added. Raises on storage errors,
+    leaving the checkpoint at the last fully queued slot.
+    """
+    if not db.backend:
+        return 0
+    current = now.replace(second=0, microsecond=0)
+    checkpoint = await db.backend.get_checkpoint(CHECKPOINT)
+    slot = current if checkpoint is None else checkpoint + MINUTE
+    if slot < current - MAX_CATCH_UP:
+        LOGGER.warning(f"Delivery outbox is {(current - slot) // MINUTE} min behind, skipping to {current - MAX_CATCH_UP:%H:%M}")
+        slot = current - MAX_CATCH_UP
+    if slot < current:
+        LOGGER.info(f"Catching up delivery slots {slot:%H:%M}-{current:%H:%M}")
+    queued = 0
+    while slot <= current:
+        users = await _recipients(slot)
+        if users:
+            await db.backend.enqueue_deliveries(slot, users)
+            queued += len(users)
+        await db.backend.set_checkpoint(CHECKPOINT, slot)
+        slot += MINUTE
+    OUTBOX_ROWS.inc(queued, outcome="queued")
+    return queued
+
+
+async def _mark(
+    slot: datetime, user_ids: list[int], status: str, attempts: int | None = None, parts: int | None = None
+):
+    if not user_ids:
+        return
+    try:
+        await db.backend.mark_deliveries(slot, user_ids, status, attempts, parts)
+    except Exception as e:
+        # Rows left pending are sent again on the next tick
+        LOGGER.error(f"Error marking {len(user_ids)} {slot:%H:%M} deliveries {status}: {e}")
+    OUTBOX_ROWS.inc(len(user_ids), outcome=status)
+
+
+async def _send_slot(bot, slot: datetime, rows: list[dict], render):
+    payloads = {}
+    empty = []
+    finished = []
+    for row in rows:
+        messages = await render(slot, row["user_id"])
+        if not messages:
+            empty.append(row["user_id"])
+        elif row["parts"] >= len(messages):
+            # The digest re-rendered no longer than the parts that already went out
+            finished.append(row["user_id"])
+        else:
+            # Resume a partly delivered digest after the parts already sent
+            payloads[row["user_id"]] = messages[row["parts"]:]
+    stats = await deliver(bot, payloads, slot=slot)
+    failed = stats.failed_chats
+    await _mark(slot, finished + [user_id for user_id in payloads if user_id not in failed], "sent")
+    await _mark(slot, empty, "skipped")
+    retries: dict[tuple[str, int, int], list[int]] = {}
+    for row in rows:
+        if row["user_id"] in failed:
+            attempts = row["attempts"] + 1
+            parts = row["parts"] + failed[row["user_id"]]
+            status = "failed" if attempts >= MAX_ATTEMPTS else "pending"
+            retries.setdefault((status, attempts, parts), []).append(row["user_id"])
+    for (status, attempts, parts), user_ids in retries.items():
+        await _mark(slot, user_ids, status, attempts, parts)
+
+
+async def drain(bot, now: datetime, render):
+    """
+    Sends the pending rows this replica owns, oldest slot first, reading
+    BATCH_SIZE rows at a time. render(slot, user_id) returns a user's messages.
+    """
+    if not db.backend:
+        return
+    since = now.replace(second=0, microsecond=0) - MAX_CATCH_UP
+    after = None
+    while True:
+        try:
+            rows = await db.backend.get_pending_deliveries(since, after, BATCH_SIZE)
+        except Exception as e:
+            LOGGER.error(f"Error reading the delivery outbox: {e}")
+            return
+        if not rows:
+            return
+        after = (rows[-1]["slot"], rows[-1]["user_id"])
+        by_slot: dict[datetime, list[dict]] = {}
+        for row in rows:
+            if coordination.owns(row["user_id"]):
+                by_slot.setdefault(row["slot"], []).append(row)
+        for slot, slot_rows in by_slot.items():
+            await _send_slot(bot, slot, slot_rows, render)
+        if len(rows) < BATCH_SIZE:
+            return
+
+
+async def prune():
+    """Deletes rows for slots older than RETENTION, in bounded batches."""
+    if not db.backend:
+        return
+    cutoff = datetime.now() - RETENTION
+    deleted = 0
+    try:
+        for _ in range(PRUNE_MAX_BATCHES):
+            removed = await db.backend.delete_deliveries_before(cutoff, PRUNE_BATCH)
+            deleted += removed
+            if removed < PRUNE_BATCH:
+                break
+    except Exception as e:
+        LOGGER.error(f"Error pruning the delivery outbox: {e}")
+    if deleted:
+        LOGGER.info(f"Pruned {deleted} delivery outbox rows older than {RETENTION.days} days")
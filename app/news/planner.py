@@ -0,0 +1,104 @@
+"""
+Decides which topics periodic_news_update refreshes, spending the daily
+GNews budget in proportion to demand instead of on a fixed cutoff.
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from .db import NewsTopics
+from . import quota, timetable
+
+LOGGER = logging.getLogger(__name__)
+
+# Left for cache misses from interactive requests
+INTERACTIVE_RESERVE = 10
+# Every topic gets this much weight even without subscribers, for /news browsing
+BASE_WEIGHT = 1
+MIN_INTERVAL = timedelta(minutes=30)
+MAX_INTERVAL = timedelta(hours=12)
+# Topics due for delivery this soon are refreshed if older than PRE_DELIVERY_MAX_AGE
+PRE_DELIVERY_WINDOW = 20
+PRE_DELIVERY_MAX_AGE = timedelta(minutes=60)
+# Requests we may spend ahead of the pacing line
+PACING_SLACK = 5
+# Share of the refresh budget paced evenly over the day (background and
+# /news browsing); the rest follows the day's delivery demand
+EVEN_SHARE = 0.3
+
+
+def refresh_budget() -> int:
+    return max(0, quota.DAILY_QUOTA - INTERACTIVE_RESERVE)
+
+
+def target_intervals() -> dict[NewsTopics, timedelta]:
+    """
+    Splits the daily refresh budget across topics by subscriber count.
+    With no subscribers anywhere this is 24h / (90 / 9) = 144 minutes each.
+    """
+    counts = timetable.subscriber_counts()
+    weights = {topic: BASE_WEIGHT + counts.get(topic.value, 0) for topic in NewsTopics}
+    total = sum(weights.values())
+    budget = refresh_budget()
+    intervals = {}
+    for topic, weight in weights.items():
+        share = budget * weight / total
+        interval = timedelta(days=1) / share if share else MAX_INTERVAL
+        intervals[topic] = min(MAX_INTERVAL, max(MIN_INTERVAL, interval))
+    return intervals
+
+
+def spend_share(minute: int) -> float:
+    """
+    Fraction of the daily refresh budget that may be spent by minute of the
+    UTC day: EVEN_SHARE of it accrues evenly, the rest as the delivery slots
+    within the next PRE_DELIVERY_WINDOW minutes come due. Without scheduled
+    deliveries the whole budget accrues evenly.
+    """
+    day_fraction = (minute + 1) / (24 * 60)
+    demand = timetable.slot_demand()
+    total = sum(demand.values())
+    if not total:
+        return day_fraction
+    horizon = minute + PRE_DELIVERY_WINDOW
+    due = sum(topics for slot, topics in demand.items() if slot <= horizon)
+    return EVEN_SHARE * day_fraction + (1 - EVEN_SHARE) * due / total
+
+
+def allowance(now: datetime) -> int:
+    """Requests the planner may still spend now, pacing the budget over the UTC day by delivery demand."""
+    utc = now.astimezone(timezone.utc)
+    share = spend_share(utc.hour * 60 + utc.minute)
+    paced = int(refresh_budget() * share) + PACING_SLACK - quota.used_today()
+    return max(0, min(paced, quota.remaining() - INTERACTIVE_RESERVE))
+
+
+def plan_refreshes(now: datetime, last_fetches: dict[NewsTopics, datetime | None]) -> list[NewsTopics]:
+    """Returns the topics to refresh now, most urgent first."""
+    intervals = target_intervals()
+    demand = timetable.upcoming_demand(now.hour, now.minute, PRE_DELIVERY_WINDOW)
+    due = []
+    for topic in NewsTopics:
+        last_fetch = last_fetches.get(topic)
+        if last_fetch is None:
+            due.append((0, float("inf"), topic))
+            continue
+        age = now - last_fetch
+        upcoming = demand.get(topic.value, 0)
+        if upcoming and age > PRE_DELIVERY_MAX_AGE:
+            # Refresh just before a delivery slot, biggest slots first
+            due.append((0, upcoming, topic))
+        elif age > intervals[topic]:
+            due.append((1, age / intervals[topic], topic))
+    due.sort(key=lambda item: (item[0], -item[1]))
+    limit = allowance(now)
+    if len(due) > limit:
+        LOGGER.info(f"{len(due)} topics due but only {limit} requests allowed now.")
+    return [topic for _, _, topic in due[:limit]]
+
+
+def plan_pre_delivery(now: datetime, topics, last_fetches: dict[NewsTopics, datetime | None]) -> list[NewsTopics]:
+    """Returns which of topics are too old to deliver, within the current allowance."""
+    stale = [
+        topic for topic in topics
+        if last_fetches.get(topic) is None or now - last_fetches[topic] > PRE_DELIVERY_MAX_AGE
+    ]
+    return stale[:allowance(now)]
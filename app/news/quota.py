@@ -0,0 +1,69 @@
+"""
+Ledger of GNews requests spent today. The count lives in the api_usage table
+and is incremented atomically there, so replicas share one quota and a
+restart doesn't forget what was already used; this process keeps the last
+total it saw. GNews resets the daily quota at midnight UTC.
+"""
+import logging
+import os
+from datetime import datetime, timezone
+from . import db
+
+LOGGER = logging.getLogger(__name__)
+DAILY_QUOTA = int(os.getenv("GNEWS_DAILY_QUOTA", 100))
+
+_day: str | None = None
+_used = 0
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _roll_over():
+    global _day, _used
+    today = _today()
+    if _day != today:
+        _day, _used = today, 0
+
+
+async def load():
+    """Picks up today's usage from the database."""
+    global _used
+    _roll_over()
+    used = await db.get_api_usage(_day)
+    if used is not None:
+        _used = max(_used, used)
+    LOGGER.info(f"GNews quota: {_used}/{DAILY_QUOTA} requests used today.")
+
+
+def used_today() -> int:
+    _roll_over()
+    return _used
+
+
+def remaining() -> int:
+    return max(0, DAILY_QUOTA - used_today())
+
+
+async def try_consume() -> bool:
+    """Reserves one request, or returns False if today's quota is spent."""
+    global _used
+    _roll_over()
+    # The shared total only grows during a day, so a spent local view is final
+    if _used >= DAILY_QUOTA:
+        return False
+    if not db.backend:
+        _used += 1
+        return True
+    day = _day
+    try:
+        total = await db.backend.consume_api_request(day, DAILY_QUOTA)
+    except Exception as e:
+        # Keep fetching on the local count rather than stalling every refresh
+        LOGGER.error(f"Error recording API usage for {day}: {e}")
+        _used += 1
+        return True
+    if day == _day:
+        _used = DAILY_QUOTA if total is None else max(_used, total)
+    return total is not None
@@ -0,0 +1,185 @@
+"""
+Renders topic blocks once per refresh generation and assembles digests from
+them, so subscribers sharing a topic set share the same text. A story filed
+under several of a user's topics is only listed under the first one.
+"""
+import logging
+from cachetools import TTLCache
+from .cache import get_news_swr, get_generation, headline_url, CACHE_DURATION
+from . import metrics, similarity
+from .db import NewsTopics
+
+LOGGER = logging.getLogger(__name__)
+
+# Scheduled digests and the /mynews view use different headers and separators
+DIGEST_STYLE = "digest"
+MY_NEWS_STYLE = "my_news"
+_STYLES = {
+    DIGEST_STYLE: (lambda topic: f"**{topic.name}**\n", "\n\n"),
+    MY_NEWS_STYLE: (lambda topic: f"📍 **{topic.name.title()}**\n", "\n\n---\n\n"),
+}
+DIGEST_CACHE_SIZE = 512
+# Telegram's limit, counted in UTF-16 code units
+MESSAGE_LIMIT = 4096
+_MARKDOWN_CHARS = str.maketrans("", "", "*_`[")
+_TOPIC_ORDER = {topic: i for i, topic in enumerate(NewsTopics)}
+
+# (topic, style) -> (generation, headlines, block)
+_blocks: TTLCache = TTLCache(maxsize=len(NewsTopics) * len(_STYLES), ttl=CACHE_DURATION.total_seconds())
+# (style, topics) -> (generations, messages)
+_digests: TTLCache = TTLCache(maxsize=DIGEST_CACHE_SIZE, ttl=CACHE_DURATION.total_seconds())
+DIGEST_CACHE_STATS = {"hits": 0, "misses": 0}
+
+metrics.Counter(
+    "newsworthy_digest_cache_total", "Rendered digest cache lookups by result.", ("result",),
+    callback=lambda: {(result,): count for result, count in DIGEST_CACHE_STATS.items()},
+)
+
+
+def _render_block(topic: NewsTopics, style: str, headlines: list[str]) -> str:
+    header, _ = _STYLES[style]
+    return header(topic) + "\n\n".join(headlines)
+
+
+async def _topic_block(topic: NewsTopics, style: str, budget: float | None) -> tuple[list[str], str] | None:
+    generation = get_generation(topic)
+    cached = _blocks.get((topic, style))
+    if cached is not None and cached[0] == generation:
+        return cached[1], cached[2]
+    headlines = await get_news_swr(topic, budget)
+    if not headlines:
+        return None
+    block = _render_block(topic, style, headlines)
+    _blocks[(topic, style)] = (generation, headlines, block)
+    return headlines, block
+
+
+def story_key(headline: str):
+    """Near-duplicate stories share a key: their cluster, or else their URL."""
+    url = headline_url(headline)
+    cluster = similarity.cluster_of(url)
+    return cluster if cluster is not None else url
+
+
+def sort_topics(topic_values) -> list[NewsTopics]:
+    topics = set()
+    for value in topic_values:
+        try:
+            topics.add(NewsTopics(value))
+        except ValueError:
+            continue
+    return sorted(topics, key=_TOPIC_ORDER.__getitem__)
+
+
+def _utf16_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _hard_split(piece: str, limit: int) -> list[str]:
+    """Splits a single oversized headline on whitespace, dropping Markdown markers."""
+    piece = piece.translate(_MARKDOWN_CHARS)
+    parts = []
+    while _utf16_len(piece) > limit:
+        cut, units = 0, 0
+        for cut, char in enumerate(piece):
+            units += 2 if ord(char) > 0xFFFF else 1
+            if units > limit:
+                break
+        space = max(piece.rfind("\n", 0, cut), piece.rfind(" ", 0, cut))
+        if space > 0:
+            cut = space
+        parts.append(piece[:cut].rstrip())
+        piece = piece[cut:].lstrip()
+    if piece:
+        parts.append(piece)
+    return parts
+
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> list[str]:
+    """
+    Splits text into messages within the limit, breaking only between
+    headlines so Markdown entities are never cut in half.
+    """
+    if _utf16_len(text) <= limit:
+        return [text]
+    messages = []
+    current: list[str] = []
+    size = 0
+    for piece in text.split("\n\n"):
+        piece_len = _utf16_len(piece)
+        if piece_len > limit:
+            pieces = _hard_split(piece, limit)
+        else:
+            pieces = [piece]
+        for piece in pieces:
+            piece_len = _utf16_len(piece)
+            if current and size + 2 + piece_len > limit:
+                messages.append(current)
+                current, size = [], 0
+            size += piece_len + (2 if current else 0)
+            current.append(piece)
+    if current:
+        messages.append(current)
+    # Topic separators are pointless at the edge of a message
+    chunks = []
+    for pieces in messages:
+        while pieces and pieces[0] == "---":
+            pieces.pop(0)
+        while pieces and pieces[-1] == "---":
+            pieces.pop()
+        if pieces:
+            chunks.append("\n\n".join(pieces))
+    return chunks
+
+
+async def render_digest(topic_values, style: str = DIGEST_STYLE, budget: float | None = None) -> list[str]:
+    """
+    Returns the digest for a set of topic values, already split into
+    messages, or an empty list if there's no news. budget bounds the wait
+    for topics with nothing cached (see get_news_swr).
+    """
+    topics = sort_topics(topic_values)
+    if not topics:
+        return []
+    key = (style, tuple(topics))
+    generations = tuple(get_generation(topic) for topic in topics)
+    cached = _digests.get(key)
+    if cached is not None and cached[0] == generations:
+        DIGEST_CACHE_STATS["hits"] += 1
+        return list(cached[1])
+    DIGEST_CACHE_STATS["misses"] += 1
+
+    blocks = []
+    emitted = set()
+    complete = True
+    for topic in topics:
+        try:
+            rendered = await _topic_block(topic, style, budget)
+        except Exception as e:
+            LOGGER.error(f"Error rendering news for {topic.value}: {e}")
+            complete = False
+            continue
+        if rendered is None:
+            complete = False
+            continue
+        headlines, block = rendered
+        unseen = []
+        for headline in headlines:
+            story = story_key(headline)
+            if story not in emitted:
+                emitted.add(story)
+                unseen.append(headline)
+        # The shared block is reused unless this user already got some of its stories
+        if len(unseen) == len(headlines):
+            blocks.append(block)
+        elif unseen:
+            blocks.append(_render_block(topic, style, unseen))
+    if not blocks:
+        return []
+    _, separator = _STYLES[style]
+    messages = split_message(separator.join(blocks))
+    # A topic that timed out or failed may fill in without a generation bump,
+    # so a digest missing one is never cached
+    if complete:
+        _digests[key] = (generations, messages)
+    return list(messages)
@@ -1,55 +1,162 @@
 from datetime import datetime, timedelta
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from .db import get_users_by_delivery_time, fetch_my_subscriptions, NewsTopics
-from .cache import get_cached_news, fetch_and_store_news, get_last_fetch_time
+from .db import (
+    fetch_my_subscriptions,
+    get_all_delivery_times,
+    get_all_subscriptions,
+    NewsTopics,
+)
+from .cache import fetch_and_store_news, get_last_fetch_time, compact_news, load_indexes
+from .render import render_digest, sort_topics, DIGEST_STYLE
+from .planner import plan_refreshes, plan_pre_delivery
+from . import coordination, outbox, quota, timetable
+from .metrics import timed_job
 import logging
 
 LOGGER = logging.getLogger(__name__)
-UPDATE_CUTOFF = timedelta(minutes=144)
+TIMETABLE_RECONCILE_MINUTES = 30
+# How far ahead digests are prepared for upcoming delivery slots
+PREFETCH_MINUTES = 3
+
+# Only the holder of these leases refreshes news / compacts the table
+REFRESH_LEASE = "news_refresh"
+REFRESH_LEASE_TTL = timedelta(minutes=25)
+COMPACTION_LEASE = "news_compaction"
+COMPACTION_LEASE_TTL = timedelta(hours=13)
+# Only the holder queues delivery slots into the outbox; every replica sends
+OUTBOX_LEASE = "delivery_outbox"
+OUTBOX_LEASE_TTL = timedelta(minutes=3)
+
+_scheduler = None
+
+# Slots prefetch_upcoming has already prepared
+_prepared: set[datetime] = set()
+
+
+async def load_timetable():
+    """(Re)builds the in-memory delivery index from the database."""
+    timetable.begin_reload()
+    delivery_times = await get_all_delivery_times()
+    subscriptions = await get_all_subscriptions()
+    if delivery_times is None or subscriptions is None:
+        timetable.abort_reload()
+        LOGGER.warning("Could not load delivery timetable, keeping the current one.")
+        return
+    timetable.replace(delivery_times, subscriptions)
+
+
+async def _topics_for(user_id: int) -> list[str]:
+    if timetable.is_loaded():
+        return timetable.topics_for(user_id)
+    return await fetch_my_subscriptions(user_id)
+
+
+async def prefetch_upcoming():
+    """
+    Prepares the next few delivery slots ahead of time: refreshes stale
+    topics their recipients need and renders their digests into the digest
+    cache. The slot still renders at send time, so news stored in between
+    (which bumps the topic's generation) is not left out.
+    """
+    if not timetable.is_loaded():
+        return
+    now = datetime.now().replace(second=0, microsecond=0)
+    for slot in [slot for slot in _prepared if slot < now]:
+        _prepared.discard(slot)
+    for offset in range(1, PREFETCH_MINUTES + 1):
+        slot = now + timedelta(minutes=offset)
+        if slot in _prepared:
+            continue
+        users = [user_id for user_id in timetable.users_at(slot.hour, slot.minute) if coordination.owns(user_id)]
+        if not users:
+            continue
+        if await coordination.hold_lease(REFRESH_LEASE, REFRESH_LEASE_TTL):
+            topics = sort_topics({topic for user_id in users for topic in timetable.topics_for(user_id)})
+            last_fetches = {topic: await get_last_fetch_time(topic) for topic in topics}
+            for topic in plan_pre_delivery(now, topics, last_fetches):
+                LOGGER.info(f"Refreshing {topic.value} ahead of the {slot:%H:%M} delivery")
+                await fetch_and_store_news(topic)
+        topic_sets = {tuple(timetable.topics_for(user_id)) for user_id in users}
+        for topic_set in topic_sets:
+            await render_digest(topic_set, DIGEST_STYLE)
+        _prepared.add(slot)
+        LOGGER.info(f"Rendered {len(topic_sets)} digests for the {len(users)} users of the {slot:%H:%M} delivery")
+
+
+async def _digest_for(slot: datetime, user_id: int) -> list[str]:
+    # Served from the digest cache warmed by prefetch_upcoming unless a topic changed since
+    return await render_digest(await _topics_for(user_id), DIGEST_STYLE)
 
 
 async def send_scheduled_news(app):
+    """
+    Queues the slots due since the last run into the outbox, then sends
+    whatever this replica has pending there, including earlier slots that
+    were missed or failed.
+    """
     now = datetime.now()
-    users = await get_users_by_delivery_time(now.hour, now.minute)
-    for user_id in users:
-        topics = await fetch_my_subscriptions(user_id)
-        messages = []
-        for topic_value in topics:
-            try:
-                topic = NewsTopics(topic_value)
-                headlines = await get_cached_news(topic)
-                if not headlines:
-                    headlines = await fetch_and_store_news(topic)
-                if headlines:
-                    messages.append(f"**{topic.name}**\n" + "\n\n".join(headlines))
-            except Exception as e:
-                LOGGER.error(f"Error sending news for {topic_value} to {user_id}: {e}")
-        if messages:
-            try:
-                await app.bot.send_message(chat_id=user_id, text="\n\n".join(messages))
-            except Exception as e:
-                LOGGER.error(f"Failed to send news to {user_id}: {e}")
+    if await coordination.hold_lease(OUTBOX_LEASE, OUTBOX_LEASE_TTL):
+        try:
+            await outbox.enqueue_due(now)
+        except Exception as e:
+            LOGGER.error(f"Error queueing deliveries: {e}")
+    await outbox.drain(app.bot, now, _digest_for)
 
 
 async def periodic_news_update():
     """
-    Background task to ensure each news topic is refreshed at least every 144 minutes.
-    This stays within the 100 requests/day limit (9 topics * 24h / 144min = 90 requests/day).
+    Background task that refreshes the topics chosen by the planner, spending
+    the 100 requests/day GNews quota where subscribers and upcoming deliveries are.
     """
     LOGGER.info("Checking for periodic news updates...")
+    # Pace against what every replica has spent, not just this one
+    await quota.load()
+    now = datetime.now()
+    last_fetches = {}
     for topic in NewsTopics:
+        last_fetches[topic] = await get_last_fetch_time(topic)
+    for topic in plan_refreshes(now, last_fetches):
         try:
-            last_fetch = await get_last_fetch_time(topic)
-            if not last_fetch or (datetime.now() - last_fetch) > UPDATE_CUTOFF:
-                LOGGER.info(f"Updating news for topic: {topic.value}")
-                await fetch_and_store_news(topic)
+            LOGGER.info(f"Updating news for topic: {topic.value}")
+            await fetch_and_store_news(topic)
         except Exception as e:
             LOGGER.error(f"Error in periodic update for {topic.value}: {e}")
 
 
 async def setup_scheduler(app):
+    global _scheduler
+    # Imported here to keep it off the startup import path
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+    await quota.load()
+    await coordination.heartbeat()
     scheduler = AsyncIOScheduler()
-    scheduler.add_job(send_scheduled_news, "cron", minute="*", args=[app])
+    # The bulk reads run in the background so updates are served right away;
+    # until the timetable loads (or a snapshot provides it) delivery queries per slot
+    scheduler.add_job(load_indexes, "date")
+    scheduler.add_job(coordination.heartbeat, "interval", seconds=coordination.HEARTBEAT_SECONDS)
+    scheduler.add_job(timed_job(send_scheduled_news), "cron", minute="*", args=[app])
+    # Half a minute off the delivery tick so the two never compete
+    scheduler.add_job(timed_job(prefetch_upcoming), "cron", minute="*", second=30)
+    # Catch changes made outside this process (dashboard edits, other instances)
+    scheduler.add_job(
+        timed_job(load_timetable), "interval", minutes=TIMETABLE_RECONCILE_MINUTES, next_run_time=datetime.now()
+    )
     # Check every 10 minutes if any topic needs an update
-    scheduler.add_job(periodic_news_update, "interval", minutes=10)
+    refresh = coordination.leased(REFRESH_LEASE, REFRESH_LEASE_TTL)(periodic_news_update)
+    scheduler.add_job(timed_job(refresh), "interval", minutes=10)
+    # Keep the news table from growing without bound
+    compact = coordination.leased(COMPACTION_LEASE, COMPACTION_LEASE_TTL)(compact_news)
+    scheduler.add_job(timed_job(compact), "interval", hours=6)
+    prune = coordination.leased(COMPACTION_LEASE, COMPACTION_LEASE_TTL)(outbox.prune)
+    scheduler.add_job(timed_job(prune), "interval", hours=6)
     scheduler.start()
+    _scheduler = scheduler
+
+
+async def shutdown_scheduler():
+    """Stops the jobs and hands this replica's users and leases to the others."""
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.shutdown(wait=False)
+        _scheduler = None
+    await coordination.leave(REFRESH_LEASE, COMPACTION_LEASE, OUTBOX_LEASE)
@@ -0,0 +1,148 @@
+"""
+In-memory inverted index over stored articles, behind the /search command.
+Fed by store_news and rebuilt from the news table at startup (see
+cache.load_indexes), so searches never touch GNews.
+"""
+import heapq
+import logging
+import math
+import re
+import time
+from collections import OrderedDict
+from itertools import islice
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+LOGGER = logging.getLogger(__name__)
+
+MAX_DOCS = 20000
+MAX_CANDIDATES = 2000
+TITLE_WEIGHT = 3.0
+# Score halves for every RECENCY_HALF_LIFE_HOURS of article age
+RECENCY_HALF_LIFE_HOURS = 48
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with "
+    "about any anything after new news over says than what when who why how".split()
+)
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+@dataclass
+class _Doc:
+    title: str
+    url: str
+    published: float
+    topics: set[str] = field(default_factory=set)
+    terms: dict[str, float] = field(default_factory=dict)
+
+
+# url -> document, oldest first for eviction
+_docs: OrderedDict[str, _Doc] = OrderedDict()
+# term -> {url: weight}
+_postings: dict[str, dict[str, float]] = {}
+
+
+def _normalize(word: str) -> str:
+    """Folds simple English plurals so "elections" matches "election"."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str | None) -> list[str]:
+    if not text:
+        return []
+    return [_normalize(word) for word in _WORD.findall(text.lower()) if len(word) > 1 and word not in STOPWORDS]
+
+
+def _timestamp(published_at) -> float:
+    if isinstance(published_at, datetime):
+        moment = published_at
+    else:
+        try:
+            moment = datetime.fromisoformat(published_at)
+        except (TypeError, ValueError):
+            return time.time()
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _remove(url: str):
+    doc = _docs.pop(url)
+    for term in doc.terms:
+        postings = _postings.get(term)
+        if postings is not None:
+            postings.pop(url, None)
+            if not postings:
+                del _postings[term]
+
+
+def add_article(url: str, title: str | None, content: str | None, topic: str, published_at=None):
+    """Indexes an article; re-adding a known URL only records the extra topic."""
+    if not url:
+        return
+    doc = _docs.get(url)
+    if doc is not None:
+        doc.topics.add(topic)
+        return
+    terms: dict[str, float] = {}
+    for term in tokenize(title):
+        terms[term] = terms.get(term, 0.0) + TITLE_WEIGHT
+    for term in tokenize(content):
+        terms[term] = terms.get(term, 0.0) + 1.0
+    _docs[url] = _Doc(title or url, url, _timestamp(published_at), {topic}, terms)
+    for term, weight in terms.items():
+        _postings.setdefault(term, {})[url] = weight
+    while len(_docs) > MAX_DOCS:
+        _remove(next(iter(_docs)))
+
+
+def search(query: str, limit: int = 10) -> list[tuple[str, str]]:
+    """
+    Returns up to limit (title, url) pairs, best first. Scores add a saturated,
+    idf-weighted term weight per query term, scaled by the number of query
+    terms matched and halved every RECENCY_HALF_LIFE_HOURS of article age.
+    Candidates are the newest MAX_CANDIDATES articles for each term, which
+    bounds the cost of very common words.
+    """
+    terms = [term for term in dict.fromkeys(tokenize(query)) if term in _postings]
+    if not terms:
+        return []
+    candidates = set()
+    for term in terms:
+        candidates.update(islice(reversed(_postings[term]), MAX_CANDIDATES))
+    weights = [(_postings[term], math.log(1 + len(_docs) / len(_postings[term]))) for term in terms]
+    now = time.time()
+    decay = math.log(0.5) / (RECENCY_HALF_LIFE_HOURS * 3600)
+
+    def rank(url):
+        score = 0.0
+        matched = 0
+        for postings, idf in weights:
+            weight = postings.get(url)
+            if weight:
+                score += idf * weight / (weight + 1.2)
+                matched += 1
+        age = max(0.0, now - _docs[url].published)
+        return score * matched * math.exp(decay * age)
+
+    return [(_docs[url].title, url) for url in heapq.nlargest(limit, candidates, key=rank)]
+
+
+def size() -> int:
+    return len(_docs)
+
+
+def rebuild(rows: list[dict]):
+    """Replaces the index with rows from get_recent_news (newest first)."""
+    started = time.perf_counter()
+    _docs.clear()
+    _postings.clear()
+    # Oldest first so eviction order matches insertion by store_news
+    for row in reversed(rows):
+        add_article(row["url"], row["title"], row["content"], row["topic"], row["published_at"])
+    LOGGER.info(f"Search index built: {len(_docs)} articles, {len(_postings)} terms "
+                f"in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,103 @@
+"""
+Near-duplicate detection for articles, so a story filed under several topics
+shows up once per digest. Each article gets a 64-bit SimHash of its title and
+content shingles; articles within MAX_DISTANCE bits of each other share a
+cluster. Lookups split the hash into bands: by pigeonhole, two hashes within
+MAX_DISTANCE bits agree exactly on at least one of MAX_DISTANCE + 1 bands.
+"""
+import re
+from collections import OrderedDict
+import mmh3
+
+MAX_DISTANCE = 3
+BANDS = MAX_DISTANCE + 1
+BAND_BITS = 64 // BANDS
+SHINGLE_SIZE = 3
+# Articles remembered; the oldest are dropped first
+MAX_ARTICLES = 5000
+
+_WORDS = re.compile(r"\w+")
+
+# url hash -> (simhash, cluster id)
+_articles: OrderedDict[int, tuple[int, int]] = OrderedDict()
+# (band index, band value) -> url hashes
+_bands: dict[tuple[int, int], set[int]] = {}
+
+
+def url_key(url: str) -> int:
+    return mmh3.hash64(url, signed=False)[0]
+
+
+def simhash(text: str) -> int:
+    words = _WORDS.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        shingles = {" ".join(words)} if words else set()
+    else:
+        shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    # A bit is set in the result when most shingle hashes have it set
+    ones = [0] * 64
+    for shingle in shingles:
+        value = mmh3.hash64(shingle, signed=False)[0]
+        while value:
+            low = value & -value
+            ones[low.bit_length() - 1] += 1
+            value ^= low
+    half = len(shingles) / 2
+    result = 0
+    for bit, count in enumerate(ones):
+        if count > half:
+            result |= 1 << bit
+    return result
+
+
+def _band_keys(value: int):
+    mask = (1 << BAND_BITS) - 1
+    for band in range(BANDS):
+        yield band, value >> (band * BAND_BITS) & mask
+
+
+def _evict():
+    while len(_articles) > MAX_ARTICLES:
+        key, (value, _) = _articles.popitem(last=False)
+        for band_key in _band_keys(value):
+            members = _bands.get(band_key)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del _bands[band_key]
+
+
+def add_article(url: str, title: str | None, content: str | None) -> int:
+    """Indexes an article and returns its cluster id."""
+    key = url_key(url)
+    known = _articles.get(key)
+    if known is not None:
+        return known[1]
+    value = simhash(f"{title or ''} {content or ''}")
+    cluster = key
+    for band_key in _band_keys(value):
+        for other in _bands.get(band_key, ()):
+            other_value, other_cluster = _articles[other]
+            if bin(value ^ other_value).count("1") <= MAX_DISTANCE:
+                cluster = other_cluster
+                break
+        if cluster != key:
+            break
+    _articles[key] = (value, cluster)
+    for band_key in _band_keys(value):
+        _bands.setdefault(band_key, set()).add(key)
+    _evict()
+    return cluster
+
+
+def rebuild(rows: list[dict]):
+    """Replaces the index with the newest MAX_ARTICLES of rows from get_recent_news (newest first)."""
+    _articles.clear()
+    _bands.clear()
+    for row in reversed(rows[:MAX_ARTICLES]):
+        add_article(row["url"], row["title"], row["content"])
+
+
+def cluster_of(url: str) -> int | None:
+    known = _articles.get(url_key(url))
+    return known[1] if known is not None else None
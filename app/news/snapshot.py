@@ -0,0 +1,69 @@
+"""
+Warm restarts: the in-memory headline lists and delivery timetable are
+written to a local file on shutdown and read back at boot, before the
+database is reachable. Both are refreshed from the database right after.
+"""
+import json
+import logging
+import os
+import time
+from . import cache, timetable
+
+LOGGER = logging.getLogger(__name__)
+
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "news_worthy_snapshot.json")
+# Older snapshots are ignored rather than served
+SNAPSHOT_MAX_AGE = 12 * 3600
+VERSION = 1
+
+
+def save(path: str = SNAPSHOT_PATH) -> bool:
+    delivery_times, subscriptions = timetable.export() if timetable.is_loaded() else ({}, {})
+    state = {
+        "version": VERSION,
+        "saved_at": time.time(),
+        "headlines": cache.export_headlines(),
+        "timetable": {
+            "loaded": timetable.is_loaded(),
+            "delivery_times": {str(user_id): slot for user_id, slot in delivery_times.items()},
+            "subscriptions": {str(user_id): sorted(topics) for user_id, topics in subscriptions.items()},
+        },
+    }
+    try:
+        # Write then rename, so a crash mid-write leaves the old snapshot intact
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        LOGGER.error(f"Error writing snapshot to {path}: {e}")
+        return False
+    LOGGER.info(f"Snapshot saved: {len(state['headlines'])} headline lists, {len(delivery_times)} scheduled users.")
+    return True
+
+
+def load(path: str = SNAPSHOT_PATH) -> bool:
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError) as e:
+        LOGGER.error(f"Error reading snapshot {path}: {e}")
+        return False
+    age = time.time() - state.get("saved_at", 0)
+    if state.get("version") != VERSION or age > SNAPSHOT_MAX_AGE:
+        LOGGER.info(f"Ignoring snapshot {path} (version {state.get('version')}, {age / 60:.0f} min old).")
+        return False
+    try:
+        cache.restore_headlines(state["headlines"])
+        table = state["timetable"]
+        if table["loaded"] and not timetable.is_loaded():
+            timetable.replace(
+                {int(user_id): tuple(slot) for user_id, slot in table["delivery_times"].items()},
+                {int(user_id): set(topics) for user_id, topics in table["subscriptions"].items()},
+            )
+    except (KeyError, TypeError, ValueError) as e:
+        LOGGER.error(f"Malformed snapshot {path}: {e}")
+        return False
+    LOGGER.info(f"Restored snapshot from {age / 60:.0f} min ago.")
+    return True
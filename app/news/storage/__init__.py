@@ -0,0 +1,21 @@
+import os
+from .base import StorageBackend
+
+
+def create_backend() -> StorageBackend | None:
+    """
+    Builds the backend named by STORAGE_BACKEND ("supabase", the default, or
+    "sqlite" with the file at SQLITE_PATH). Returns None if it isn't configured.
+    """
+    name = os.getenv("STORAGE_BACKEND", "supabase").lower()
+    if name == "sqlite":
+        from .sqlite_backend import SQLiteBackend
+        return SQLiteBackend(os.getenv("SQLITE_PATH", "news_worthy.db"))
+    if name == "supabase":
+        url = os.getenv("SUPABASE_URL")
+        key = os.getenv("SUPABASE_KEY")
+        if not url or not key:
+            return None
+        from .supabase_backend import SupabaseBackend
+        return SupabaseBackend(url, key)
+    raise ValueError(f"Unknown STORAGE_BACKEND: {name}")
@@ -0,0 +1,136 @@
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+
+class StorageBackend(ABC):
+    """
+    Raw storage operations behind news.db and news.cache.
+    Methods raise on failure; callers handle logging and fallbacks.
+    News rows are dicts with title, content, url, published_at, topic and fetched_at.
+    Backends may store content compressed but always take and return plain text.
+    """
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    # --- Users and subscriptions ---
+
+    @abstractmethod
+    async def upsert_user(self, user_id: int, username: str | None): ...
+
+    @abstractmethod
+    async def get_subscriptions(self, user_id: int) -> list[str]: ...
+
+    @abstractmethod
+    async def add_subscription(self, user_id: int, topic: str): ...
+
+    @abstractmethod
+    async def remove_subscription(self, user_id: int, topic: str): ...
+
+    @abstractmethod
+    async def set_delivery_time(self, user_id: int, hour: int, minute: int): ...
+
+    @abstractmethod
+    async def get_delivery_time(self, user_id: int) -> tuple[int, int] | None: ...
+
+    @abstractmethod
+    async def get_users_by_delivery_time(self, hour: int, minute: int) -> list[int]: ...
+
+    @abstractmethod
+    async def get_all_delivery_times(self) -> dict[int, tuple[int, int]]: ...
+
+    @abstractmethod
+    async def get_all_subscriptions(self) -> dict[int, set[str]]: ...
+
+    @abstractmethod
+    async def get_api_usage(self, day: str) -> int: ...
+
+    @abstractmethod
+    async def consume_api_request(self, day: str, limit: int) -> int | None:
+        """
+        Atomically adds one request to day's count unless it has reached
+        limit. Returns the new count, or None if the limit was already reached.
+        """
+
+    # --- News ---
+
+    @abstractmethod
+    async def insert_news(self, rows: list[dict]): ...
+
+    @abstractmethod
+    async def find_news_urls(self, topic: str, urls: list[str]) -> set[str]: ...
+
+    @abstractmethod
+    async def touch_news(self, topic: str, urls: list[str], fetched_at: str): ...
+
+    @abstractmethod
+    async def get_last_fetch_time(self, topic: str) -> datetime | None: ...
+
+    @abstractmethod
+    async def get_latest_news(self, topic: str, limit: int) -> list[dict]:
+        """Newest rows first, with only title and url."""
+
+    @abstractmethod
+    async def get_recent_news(self, limit: int) -> list[dict]:
+        """Newest limit rows first, with title, content, url, topic and published_at."""
+
+    @abstractmethod
+    async def delete_news_older_than(self, cutoff: datetime, batch: int) -> int:
+        """Deletes up to batch rows fetched before cutoff; returns how many."""
+
+    @abstractmethod
+    async def delete_news_beyond(self, topic: str, keep: int, batch: int) -> int:
+        """Deletes up to batch rows past the newest keep for topic; returns how many."""
+
+    # --- Replica coordination ---
+
+    @abstractmethod
+    async def acquire_lease(self, name: str, holder: str, expires_at: datetime, now: datetime) -> bool:
+        """Takes or renews lease name for holder if it is free, expired or already theirs."""
+
+    @abstractmethod
+    async def release_lease(self, name: str, holder: str): ...
+
+    @abstractmethod
+    async def heartbeat(self, replica_id: str, seen_at: datetime): ...
+
+    @abstractmethod
+    async def get_live_replicas(self, since: datetime) -> list[str]:
+        """Replicas whose last heartbeat is at or after since."""
+
+    @abstractmethod
+    async def remove_replica(self, replica_id: str): ...
+
+    # --- Delivery outbox ---
+
+    @abstractmethod
+    async def get_checkpoint(self, name: str) -> datetime | None: ...
+
+    @abstractmethod
+    async def set_checkpoint(self, name: str, value: datetime): ...
+
+    @abstractmethod
+    async def enqueue_deliveries(self, slot: datetime, user_ids: list[int]):
+        """Adds pending rows for slot; users already queued for it keep their row."""
+
+    @abstractmethod
+    async def get_pending_deliveries(
+        self, since: datetime, after: tuple[datetime, int] | None, limit: int
+    ) -> list[dict]:
+        """
+        Up to limit pending rows (user_id, slot, attempts, parts) for slots at or after
+        since, ordered by slot then user_id and starting past the after key.
+        """
+
+    @abstractmethod
+    async def mark_deliveries(
+        self, slot: datetime, user_ids: list[int], status: str, attempts: int | None = None, parts: int | None = None
+    ):
+        """Sets status, and attempts and parts (messages already delivered) when given."""
+
+    @abstractmethod
+    async def delete_deliveries_before(self, cutoff: datetime, batch: int) -> int:
+        """Deletes about batch rows for the oldest slots before cutoff; returns how many."""
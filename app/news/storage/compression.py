@@ -0,0 +1,39 @@
+"""
+zstd compression for the news.content column. Content is only compressed when
+that makes it smaller, and readers accept both forms, so rows written before
+compression (or too short to benefit) stay readable.
+"""
+import base64
+import zstandard
+
+LEVEL = 10
+# Marks base64 zstd in text columns; binary columns store the raw frame as a blob
+TEXT_PREFIX = "zstd:"
+
+_compressor = zstandard.ZstdCompressor(level=LEVEL)
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def compress_blob(text: str | None) -> str | bytes | None:
+    """For binary columns: compressed bytes, or the text itself if that is shorter."""
+    if not text:
+        return text
+    raw = text.encode()
+    packed = _compressor.compress(raw)
+    return packed if len(packed) < len(raw) else text
+
+
+def compress_text(text: str | None) -> str | None:
+    """For text columns: prefixed base64 of the compressed text, or the text itself if that is shorter."""
+    if not text:
+        return text
+    packed = TEXT_PREFIX + base64.b64encode(_compressor.compress(text.encode())).decode()
+    return packed if len(packed) < len(text.encode()) else text
+
+
+def decompress(value: str | bytes | None) -> str | None:
+    if isinstance(value, bytes):
+        return _decompressor.decompress(value).decode()
+    if value and value.startswith(TEXT_PREFIX):
+        return _decompressor.decompress(base64.b64decode(value[len(TEXT_PREFIX):])).decode()
+    return value
@@ -0,0 +1,291 @@
+import logging
+from datetime import datetime
+import aiosqlite
+from .base import StorageBackend
+from .compression import compress_blob, decompress
+
+LOGGER = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT,
+    delivery_hour INTEGER,
+    delivery_minute INTEGER
+);
+CREATE INDEX IF NOT EXISTS users_delivery_time ON users (delivery_hour, delivery_minute);
+
+CREATE TABLE IF NOT EXISTS subscriptions (
+    user_id INTEGER NOT NULL,
+    topic TEXT NOT NULL,
+    PRIMARY KEY (user_id, topic)
+);
+
+CREATE TABLE IF NOT EXISTS news (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT,
+    content BLOB,
+    url TEXT,
+    published_at TEXT,
+    topic TEXT NOT NULL,
+    fetched_at TEXT
+);
+CREATE INDEX IF NOT EXISTS news_topic_published ON news (topic, published_at);
+CREATE INDEX IF NOT EXISTS news_topic_fetched ON news (topic, fetched_at);
+CREATE INDEX IF NOT EXISTS news_topic_url ON news (topic, url);
+CREATE INDEX IF NOT EXISTS news_fetched ON news (fetched_at);
+
+CREATE TABLE IF NOT EXISTS api_usage (
+    day TEXT PRIMARY KEY,
+    requests INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS replicas (
+    replica_id TEXT PRIMARY KEY,
+    seen_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS deliveries (
+    user_id INTEGER NOT NULL,
+    slot TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    parts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (slot, user_id)
+);
+CREATE INDEX IF NOT EXISTS deliveries_pending ON deliveries (status, slot, user_id);
+
+CREATE TABLE IF NOT EXISTS checkpoints (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SQLiteBackend(StorageBackend):
+    """Local single-node storage in a WAL-mode SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn: aiosqlite.Connection | None = None
+
+    async def connect(self):
+        self.conn = await aiosqlite.connect(self.path)
+        self.conn.row_factory = aiosqlite.Row
+        await self.conn.execute("PRAGMA journal_mode=WAL")
+        await self.conn.execute("PRAGMA synchronous=NORMAL")
+        await self.conn.executescript(SCHEMA)
+        await self.conn.commit()
+        LOGGER.info(f"SQLite database ready at {self.path}")
+
+    async def close(self):
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+    async def _all(self, sql: str, params=()) -> list[aiosqlite.Row]:
+        async with self.conn.execute(sql, params) as cursor:
+            return await cursor.fetchall()
+
+    async def _write(self, sql: str, params=()) -> int:
+        cursor = await self.conn.execute(sql, params)
+        await self.conn.commit()
+        return cursor.rowcount
+
+    # --- Users and subscriptions ---
+
+    async def upsert_user(self, user_id, username):
+        await self._write(
+            "INSERT INTO users (user_id, username) VALUES (?, ?) "
+            "ON CONFLICT (user_id) DO UPDATE SET username = excluded.username",
+            (user_id, username),
+        )
+
+    async def get_subscriptions(self, user_id):
+        rows = await self._all("SELECT topic FROM subscriptions WHERE user_id = ?", (user_id,))
+        return [row["topic"] for row in rows]
+
+    async def add_subscription(self, user_id, topic):
+        await self._write(
+            "INSERT OR IGNORE INTO subscriptions (user_id, topic) VALUES (?, ?)", (user_id, topic)
+        )
+
+    async def remove_subscription(self, user_id, topic):
+        await self._write("DELETE FROM subscriptions WHERE user_id = ? AND topic = ?", (user_id, topic))
+
+    async def set_delivery_time(self, user_id, hour, minute):
+        await self._write(
+            "UPDATE users SET delivery_hour = ?, delivery_minute = ? WHERE user_id = ?",
+            (hour, minute, user_id),
+        )
+
+    async def get_delivery_time(self, user_id):
+        rows = await self._all("SELECT delivery_hour, delivery_minute FROM users WHERE user_id = ?", (user_id,))
+        if rows:
+            return (rows[0]["delivery_hour"], rows[0]["delivery_minute"])
+        return None
+
+    async def get_users_by_delivery_time(self, hour, minute):
+        rows = await self._all(
+            "SELECT user_id FROM users WHERE delivery_hour = ? AND delivery_minute = ?", (hour, minute)
+        )
+        return [row["user_id"] for row in rows]
+
+    async def get_all_delivery_times(self):
+        rows = await self._all(
+            "SELECT user_id, delivery_hour, delivery_minute FROM users WHERE delivery_hour IS NOT NULL"
+        )
+        return {row["user_id"]: (row["delivery_hour"], row["delivery_minute"] or 0) for row in rows}
+
+    async def get_all_subscriptions(self):
+        subscriptions: dict[int, set[str]] = {}
+        for row in await self._all("SELECT user_id, topic FROM subscriptions"):
+            subscriptions.setdefault(row["user_id"], set()).add(row["topic"])
+        return subscriptions
+
+    async def get_api_usage(self, day):
+        rows = await self._all("SELECT requests FROM api_usage WHERE day = ?", (day,))
+        return rows[0]["requests"] if rows else 0
+
+    async def consume_api_request(self, day, limit):
+        # One statement, so replicas sharing the file never lose an increment
+        rows = await self._all(
+            "INSERT INTO api_usage (day, requests) SELECT ?, 1 WHERE ? > 0 "
+            "ON CONFLICT (day) DO UPDATE SET requests = requests + 1 WHERE api_usage.requests < ? "
+            "RETURNING requests",
+            (day, limit, limit),
+        )
+        await self.conn.commit()
+        return rows[0]["requests"] if rows else None
+
+    # --- News ---
+
+    async def insert_news(self, rows):
+        await self.conn.executemany(
+            "INSERT INTO news (title, content, url, published_at, topic, fetched_at) "
+            "VALUES (:title, :content, :url, :published_at, :topic, :fetched_at)",
+            [{**row, "content": compress_blob(row["content"])} for row in rows],
+        )
+        await self.conn.commit()
+
+    async def find_news_urls(self, topic, urls):
+        placeholders = ",".join("?" * len(urls))
+        rows = await self._all(
+            f"SELECT url FROM news WHERE topic = ? AND url IN ({placeholders})", (topic, *urls)
+        )
+        return {row["url"] for row in rows}
+
+    async def touch_news(self, topic, urls, fetched_at):
+        placeholders = ",".join("?" * len(urls))
+        await self._write(
+            f"UPDATE news SET fetched_at = ? WHERE topic = ? AND url IN ({placeholders})",
+            (fetched_at, topic, *urls),
+        )
+
+    async def get_last_fetch_time(self, topic):
+        rows = await self._all("SELECT MAX(fetched_at) AS fetched_at FROM news WHERE topic = ?", (topic,))
+        if rows and rows[0]["fetched_at"]:
+            return datetime.fromisoformat(rows[0]["fetched_at"])
+        return None
+
+    async def get_latest_news(self, topic, limit):
+        rows = await self._all(
+            "SELECT title, url FROM news WHERE topic = ? ORDER BY published_at DESC LIMIT ?", (topic, limit)
+        )
+        return [dict(row) for row in rows]
+
+    async def get_recent_news(self, limit):
+        rows = await self._all(
+            "SELECT title, content, url, topic, published_at FROM news ORDER BY published_at DESC LIMIT ?", (limit,)
+        )
+        return [{**row, "content": decompress(row["content"])} for row in rows]
+
+    async def delete_news_older_than(self, cutoff, batch):
+        return await self._write(
+            "DELETE FROM news WHERE id IN (SELECT id FROM news WHERE fetched_at < ? LIMIT ?)",
+            (cutoff.isoformat(), batch),
+        )
+
+    async def delete_news_beyond(self, topic, keep, batch):
+        return await self._write(
+            "DELETE FROM news WHERE id IN ("
+            "SELECT id FROM news WHERE topic = ? ORDER BY published_at DESC LIMIT ? OFFSET ?)",
+            (topic, batch, keep),
+        )
+
+    # --- Replica coordination ---
+
+    async def acquire_lease(self, name, holder, expires_at, now):
+        # One statement, so concurrent replicas on the same file can't both win
+        return await self._write(
+            "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+            "WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+            (name, holder, expires_at.isoformat(), now.isoformat()),
+        ) == 1
+
+    async def release_lease(self, name, holder):
+        await self._write("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    async def heartbeat(self, replica_id, seen_at):
+        await self._write(
+            "INSERT INTO replicas (replica_id, seen_at) VALUES (?, ?) "
+            "ON CONFLICT (replica_id) DO UPDATE SET seen_at = excluded.seen_at",
+            (replica_id, seen_at.isoformat()),
+        )
+
+    async def get_live_replicas(self, since):
+        rows = await self._all("SELECT replica_id FROM replicas WHERE seen_at >= ?", (since.isoformat(),))
+        return [row["replica_id"] for row in rows]
+
+    async def remove_replica(self, replica_id):
+        await self._write("DELETE FROM replicas WHERE replica_id = ?", (replica_id,))
+
+    # --- Delivery outbox ---
+
+    async def get_checkpoint(self, name):
+        rows = await self._all("SELECT value FROM checkpoints WHERE name = ?", (name,))
+        return datetime.fromisoformat(rows[0]["value"]) if rows else None
+
+    async def set_checkpoint(self, name, value):
+        await self._write(
+            "INSERT INTO checkpoints (name, value) VALUES (?, ?) "
+            "ON CONFLICT (name) DO UPDATE SET value = excluded.value",
+            (name, value.isoformat()),
+        )
+
+    async def enqueue_deliveries(self, slot, user_ids):
+        await self.conn.executemany(
+            "INSERT OR IGNORE INTO deliveries (user_id, slot) VALUES (?, ?)",
+            [(user_id, slot.isoformat()) for user_id in user_ids],
+        )
+        await self.conn.commit()
+
+    async def get_pending_deliveries(self, since, after, limit):
+        sql = "SELECT user_id, slot, attempts, parts FROM deliveries WHERE status = 'pending' AND slot >= ?"
+        params = [since.isoformat()]
+        if after is not None:
+            sql += " AND (slot > ? OR (slot = ? AND user_id > ?))"
+            params += [after[0].isoformat(), after[0].isoformat(), after[1]]
+        rows = await self._all(sql + " ORDER BY slot, user_id LIMIT ?", (*params, limit))
+        return [{**row, "slot": datetime.fromisoformat(row["slot"])} for row in rows]
+
+    async def mark_deliveries(self, slot, user_ids, status, attempts=None, parts=None):
+        placeholders = ",".join("?" * len(user_ids))
+        await self._write(
+            f"UPDATE deliveries SET status = ?, attempts = COALESCE(?, attempts), parts = COALESCE(?, parts) "
+            f"WHERE slot = ? AND user_id IN ({placeholders})",
+            (status, attempts, parts, slot.isoformat(), *user_ids),
+        )
+
+    async def delete_deliveries_before(self, cutoff, batch):
+        return await self._write(
+            "DELETE FROM deliveries WHERE rowid IN (SELECT rowid FROM deliveries WHERE slot < ? LIMIT ?)",
+            (cutoff.isoformat(), batch),
+        )
@@ -0,0 +1,289 @@
+import logging
+from datetime import datetime
+from postgrest.exceptions import APIError
+from supabase import acreate_client, AsyncClient
+from .base import StorageBackend
+from .compression import compress_text, decompress
+
+LOGGER = logging.getLogger(__name__)
+
+# PostgREST caps responses at 1000 rows by default
+PAGE_SIZE = 1000
+# Compare-and-set retries for the shared quota counter
+CAS_ATTEMPTS = 5
+
+
+class SupabaseBackend(StorageBackend):
+    """
+    Supabase (PostgREST) storage. The schema is managed via the Supabase dashboard.
+    The async client keeps a pooled HTTP connection, so queries never block the loop.
+    """
+
+    def __init__(self, url: str, key: str):
+        self.url = url
+        self.key = key
+        self.client: AsyncClient | None = None
+
+    async def connect(self):
+        self.client = await acreate_client(self.url, self.key)
+
+    def table(self, name: str):
+        return self.client.table(name)
+
+    async def _fetch_all(self, build_query, limit: int | None = None) -> list[dict]:
+        """Pages through a select built fresh by build_query() for each page, up to limit rows."""
+        rows = []
+        start = 0
+        while True:
+            end = start + PAGE_SIZE if limit is None else min(start + PAGE_SIZE, limit)
+            response = await build_query().range(start, end - 1).execute()
+            rows.extend(response.data)
+            if len(response.data) < end - start or end == limit:
+                return rows
+            start = end
+
+    # --- Users and subscriptions ---
+
+    async def upsert_user(self, user_id, username):
+        data = {"user_id": user_id, "username": username}
+        await self.table("users").upsert(data, on_conflict="user_id").execute()
+
+    async def get_subscriptions(self, user_id):
+        response = await self.table("subscriptions").select("topic").eq("user_id", user_id).execute()
+        return [row["topic"] for row in response.data]
+
+    async def add_subscription(self, user_id, topic):
+        data = {"user_id": user_id, "topic": topic}
+        await self.table("subscriptions").upsert(data, on_conflict="user_id,topic").execute()
+
+    async def remove_subscription(self, user_id, topic):
+        await self.table("subscriptions").delete().eq("user_id", user_id).eq("topic", topic).execute()
+
+    async def set_delivery_time(self, user_id, hour, minute):
+        data = {"delivery_hour": hour, "delivery_minute": minute}
+        await self.table("users").update(data).eq("user_id", user_id).execute()
+
+    async def get_delivery_time(self, user_id):
+        response = await self.table("users").select("delivery_hour, delivery_minute").eq("user_id", user_id).execute()
+        if response.data:
+            row = response.data[0]
+            return (row["delivery_hour"], row["delivery_minute"])
+        return None
+
+    async def get_users_by_delivery_time(self, hour, minute):
+        response = await self.table("users").select("user_id").eq("delivery_hour", hour).eq("delivery_minute", minute).execute()
+        return [row["user_id"] for row in response.data]
+
+    async def get_all_delivery_times(self):
+        rows = await self._fetch_all(
+            lambda: self.table("users")
+            .select("user_id, delivery_hour, delivery_minute")
+            .not_.is_("delivery_hour", "null")
+            .order("user_id")
+        )
+        return {row["user_id"]: (row["delivery_hour"], row["delivery_minute"] or 0) for row in rows}
+
+    async def get_all_subscriptions(self):
+        rows = await self._fetch_all(
+            lambda: self.table("subscriptions")
+            .select("user_id, topic")
+            .order("user_id")
+            .order("topic")
+        )
+        subscriptions: dict[int, set[str]] = {}
+        for row in rows:
+            subscriptions.setdefault(row["user_id"], set()).add(row["topic"])
+        return subscriptions
+
+    async def get_api_usage(self, day):
+        response = await self.table("api_usage").select("requests").eq("day", day).execute()
+        return response.data[0]["requests"] if response.data else 0
+
+    async def consume_api_request(self, day, limit):
+        # Compare-and-set on the current count; retried when another replica got in first
+        for _ in range(CAS_ATTEMPTS):
+            response = await self.table("api_usage").select("requests").eq("day", day).execute()
+            if not response.data:
+                if limit <= 0:
+                    return None
+                try:
+                    await self.table("api_usage").insert({"day": day, "requests": 1}).execute()
+                    return 1
+                except APIError:
+                    # Another replica created today's row first
+                    continue
+            current = response.data[0]["requests"]
+            if current >= limit:
+                return None
+            response = await self.table("api_usage") \
+                .update({"requests": current + 1}) \
+                .eq("day", day) \
+                .eq("requests", current) \
+                .execute()
+            if response.data:
+                return current + 1
+        raise RuntimeError(f"api_usage for {day} kept changing under {CAS_ATTEMPTS} attempts")
+
+    # --- News ---
+
+    async def insert_news(self, rows):
+        rows = [{**row, "content": compress_text(row["content"])} for row in rows]
+        await self.table("news").insert(rows).execute()
+
+    async def find_news_urls(self, topic, urls):
+        response = await self.table("news") \
+            .select("url") \
+            .eq("topic", topic) \
+            .in_("url", urls) \
+            .execute()
+        return {row["url"] for row in response.data}
+
+    async def touch_news(self, topic, urls, fetched_at):
+        await self.table("news") \
+            .update({"fetched_at": fetched_at}) \
+            .eq("topic", topic) \
+            .in_("url", urls) \
+            .execute()
+
+    async def get_last_fetch_time(self, topic):
+        response = (
+            await self.table("news")
+            .select("fetched_at")
+            .eq("topic", topic)
+            .order("fetched_at", desc=True)
+            .limit(1)
+            .execute()
+        )
+        if response.data:
+            return datetime.fromisoformat(response.data[0]["fetched_at"])
+        return None
+
+    async def get_latest_news(self, topic, limit):
+        response = await self.table("news") \
+            .select("title, url") \
+            .eq("topic", topic) \
+            .order("published_at", desc=True) \
+            .limit(limit) \
+            .execute()
+        return response.data
+
+    async def get_recent_news(self, limit):
+        rows = await self._fetch_all(
+            lambda: self.table("news")
+            .select("title, content, url, topic, published_at")
+            .order("published_at", desc=True)
+            .order("id"),
+            limit,
+        )
+        return [{**row, "content": decompress(row["content"])} for row in rows]
+
+    async def _delete_ids(self, ids: list) -> int:
+        if ids:
+            await self.table("news").delete().in_("id", ids).execute()
+        return len(ids)
+
+    async def delete_news_older_than(self, cutoff, batch):
+        response = await self.table("news") \
+            .select("id") \
+            .lt("fetched_at", cutoff.isoformat()) \
+            .limit(batch) \
+            .execute()
+        return await self._delete_ids([row["id"] for row in response.data])
+
+    async def delete_news_beyond(self, topic, keep, batch):
+        response = await self.table("news") \
+            .select("id") \
+            .eq("topic", topic) \
+            .order("published_at", desc=True) \
+            .range(keep, keep + batch - 1) \
+            .execute()
+        return await self._delete_ids([row["id"] for row in response.data])
+
+    # --- Replica coordination ---
+
+    async def acquire_lease(self, name, holder, expires_at, now):
+        data = {"holder": holder, "expires_at": expires_at.isoformat()}
+        # Conditional update: renew our own lease or take over an expired one
+        response = await self.table("leases") \
+            .update(data) \
+            .eq("name", name) \
+            .or_(f'holder.eq."{holder}",expires_at.lt."{now.isoformat()}"') \
+            .execute()
+        if response.data:
+            return True
+        try:
+            await self.table("leases").insert({"name": name, **data}).execute()
+            return True
+        except APIError:
+            # Primary key conflict: someone else holds a live lease
+            return False
+
+    async def release_lease(self, name, holder):
+        await self.table("leases").delete().eq("name", name).eq("holder", holder).execute()
+
+    async def heartbeat(self, replica_id, seen_at):
+        data = {"replica_id": replica_id, "seen_at": seen_at.isoformat()}
+        await self.table("replicas").upsert(data, on_conflict="replica_id").execute()
+
+    async def get_live_replicas(self, since):
+        response = await self.table("replicas").select("replica_id").gte("seen_at", since.isoformat()).execute()
+        return [row["replica_id"] for row in response.data]
+
+    async def remove_replica(self, replica_id):
+        await self.table("replicas").delete().eq("replica_id", replica_id).execute()
+
+    # --- Delivery outbox ---
+
+    async def get_checkpoint(self, name):
+        response = await self.table("checkpoints").select("value").eq("name", name).execute()
+        return datetime.fromisoformat(response.data[0]["value"]) if response.data else None
+
+    async def set_checkpoint(self, name, value):
+        data = {"name": name, "value": value.isoformat()}
+        await self.table("checkpoints").upsert(data, on_conflict="name").execute()
+
+    async def enqueue_deliveries(self, slot, user_ids):
+        for start in range(0, len(user_ids), PAGE_SIZE):
+            rows = [{"user_id": user_id, "slot": slot.isoformat()} for user_id in user_ids[start:start + PAGE_SIZE]]
+            await self.table("deliveries") \
+                .upsert(rows, on_conflict="slot,user_id", ignore_duplicates=True, returning="minimal") \
+                .execute()
+
+    async def get_pending_deliveries(self, since, after, limit):
+        query = self.table("deliveries") \
+            .select("user_id, slot, attempts, parts") \
+            .eq("status", "pending") \
+            .gte("slot", since.isoformat())
+        if after is not None:
+            slot, user_id = after[0].isoformat(), after[1]
+            query = query.or_(f'slot.gt."{slot}",and(slot.eq."{slot}",user_id.gt.{user_id})')
+        response = await query.order("slot").order("user_id").limit(limit).execute()
+        return [{**row, "slot": datetime.fromisoformat(row["slot"])} for row in response.data]
+
+    async def mark_deliveries(self, slot, user_ids, status, attempts=None, parts=None):
+        data = {"status": status}
+        if attempts is not None:
+            data["attempts"] = attempts
+        if parts is not None:
+            data["parts"] = parts
+        await self.table("deliveries") \
+            .update(data) \
+            .eq("slot", slot.isoformat()) \
+            .in_("user_id", user_ids) \
+            .execute()
+
+    async def delete_deliveries_before(self, cutoff, batch):
+        response = await self.table("deliveries") \
+            .select("slot") \
+            .lt("slot", cutoff.isoformat()) \
+            .order("slot") \
+            .limit(batch) \
+            .execute()
+        if not response.data:
+            return 0
+        # No single-column key to delete by, so delete whole slots up to the batch's last one
+        response = await self.table("deliveries") \
+            .delete() \
+            .lte("slot", response.data[-1]["slot"]) \
+            .execute()
+        return len(response.data)
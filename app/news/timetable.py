@@ -0,0 +1,138 @@
+"""
+In-memory delivery index: minute of day -> user ids, plus each user's topics.
+Loaded once from the database and then kept current by the db.py writers,
+so the per-minute scheduler tick is a dictionary lookup.
+"""
+import logging
+from collections import Counter
+
+LOGGER = logging.getLogger(__name__)
+
+_slots: dict[int, set[int]] = {}
+_user_slot: dict[int, int] = {}
+_user_topics: dict[int, set[str]] = {}
+_loaded = False
+# Incremental changes made while a reload is reading the database; replayed
+# on top of the snapshot so they aren't lost.
+_journal: list[tuple] | None = None
+
+
+def minute_of_day(hour: int, minute: int) -> int:
+    return hour * 60 + minute
+
+
+def is_loaded() -> bool:
+    return _loaded
+
+
+def begin_reload():
+    global _journal
+    _journal = []
+
+
+def replace(delivery_times: dict[int, tuple[int, int]], subscriptions: dict[int, set[str]]):
+    """Swaps in a fresh snapshot from the database."""
+    global _loaded, _journal
+    journal, _journal = _journal or [], None
+    _slots.clear()
+    _user_slot.clear()
+    _user_topics.clear()
+    for user_id, (hour, minute) in delivery_times.items():
+        _set_slot(user_id, minute_of_day(hour, minute))
+    for user_id, topics in subscriptions.items():
+        _user_topics[user_id] = set(topics)
+    for op, *args in journal:
+        op(*args)
+    _loaded = True
+    LOGGER.info(f"Delivery timetable loaded: {len(_user_slot)} users in {len(_slots)} slots.")
+
+
+def export() -> tuple[dict[int, tuple[int, int]], dict[int, set[str]]]:
+    """The current index in the shape replace() takes, for snapshots."""
+    delivery_times = {user_id: divmod(slot, 60) for user_id, slot in _user_slot.items()}
+    return delivery_times, {user_id: set(topics) for user_id, topics in _user_topics.items()}
+
+
+def abort_reload():
+    global _journal
+    _journal = None
+
+
+def _record(op, *args):
+    if _journal is not None:
+        _journal.append((op, *args))
+    op(*args)
+
+
+def _set_slot(user_id: int, slot: int):
+    old = _user_slot.get(user_id)
+    if old is not None and old != slot:
+        users = _slots.get(old)
+        if users is not None:
+            users.discard(user_id)
+            if not users:
+                del _slots[old]
+    _user_slot[user_id] = slot
+    _slots.setdefault(slot, set()).add(user_id)
+
+
+def _add_topic(user_id: int, topic: str):
+    _user_topics.setdefault(user_id, set()).add(topic)
+
+
+def _remove_topic(user_id: int, topic: str):
+    topics = _user_topics.get(user_id)
+    if topics is not None:
+        topics.discard(topic)
+        if not topics:
+            del _user_topics[user_id]
+
+
+def set_delivery_time(user_id: int, hour: int, minute: int):
+    _record(_set_slot, user_id, minute_of_day(hour, minute))
+
+
+def add_subscription(user_id: int, topic: str):
+    _record(_add_topic, user_id, topic)
+
+
+def remove_subscription(user_id: int, topic: str):
+    _record(_remove_topic, user_id, topic)
+
+
+def users_at(hour: int, minute: int) -> list[int]:
+    return list(_slots.get(minute_of_day(hour, minute), ()))
+
+
+def topics_for(user_id: int) -> list[str]:
+    return sorted(_user_topics.get(user_id, ()))
+
+
+def subscriber_counts() -> Counter:
+    """Topic value -> number of subscribers."""
+    counts = Counter()
+    for topics in _user_topics.values():
+        counts.update(topics)
+    return counts
+
+
+def slot_demand() -> dict[int, int]:
+    """Minute of day -> distinct topics due then, i.e. the refreshes that slot needs."""
+    demand = {}
+    for slot, users in _slots.items():
+        topics = set()
+        for user_id in users:
+            topics.update(_user_topics.get(user_id, ()))
+        if topics:
+            demand[slot] = len(topics)
+    return demand
+
+
+def upcoming_demand(hour: int, minute: int, window: int) -> Counter:
+    """Topic value -> deliveries due in the next window minutes, wrapping at midnight."""
+    start = minute_of_day(hour, minute)
+    demand = Counter()
+    for offset in range(window):
+        for user_id in _slots.get((start + offset) % (24 * 60), ()):
+            demand.update(_user_topics.get(user_id, ()))
+    return demand
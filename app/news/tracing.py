@@ -0,0 +1,95 @@
+"""
+Per-update span tracing. Each handled update runs inside a trace held in a
+context variable, so the timed storage, GNews and Telegram calls made for it
+(including from tasks it starts) record their spans there. Shared
+single-flight fetches run outside any trace; callers record their wait on
+one as a single span. Updates slower than SLOW_UPDATE_SECONDS are logged with
+a breakdown of where the time went.
+Outside a trace a span costs one context variable lookup.
+"""
+import functools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+LOGGER = logging.getLogger(__name__)
+
+SLOW_UPDATE_SECONDS = float(os.getenv("SLOW_UPDATE_SECONDS", 1.0))
+
+
+@dataclass(slots=True)
+class Trace:
+    name: str
+    started: float = field(default_factory=time.perf_counter)
+    # (start offset, call path, duration) in completion order
+    spans: list[tuple[float, tuple[str, ...], float]] = field(default_factory=list)
+
+
+_trace: ContextVar[Trace | None] = ContextVar("trace", default=None)
+# Names of the enclosing spans
+_path: ContextVar[tuple[str, ...]] = ContextVar("trace_path", default=())
+
+
+@contextmanager
+def span(name: str):
+    """Times the enclosed block as a span of the current trace, if any."""
+    trace = _trace.get()
+    if trace is None:
+        yield
+        return
+    path = _path.get() + (name,)
+    token = _path.set(path)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _path.reset(token)
+        trace.spans.append((started - trace.started, path, time.perf_counter() - started))
+
+
+def breakdown(trace: Trace) -> str:
+    """
+    One line per call path, as a tree in call order. Repeated calls along the
+    same path (such as a gather over topics) share a line with their summed time.
+    """
+    totals: dict[tuple[str, ...], list] = {}
+    for start, path, duration in trace.spans:
+        entry = totals.setdefault(path, [start, 0, 0.0])
+        entry[0] = min(entry[0], start)
+        entry[1] += 1
+        entry[2] += duration
+
+    def order(path):
+        return tuple(totals[path[:i]][0] if path[:i] in totals else 0.0 for i in range(1, len(path) + 1))
+
+    lines = []
+    for path in sorted(totals, key=order):
+        _, count, total = totals[path]
+        calls = f" x{count}" if count > 1 else ""
+        lines.append(f"{'  ' * len(path)}{path[-1]}{calls}: {total * 1000:.0f} ms")
+    return "\n".join(lines)
+
+
+def traced(func):
+    """Runs the decorated update handler in a new trace and logs it if slow."""
+
+    @functools.wraps(func)
+    async def wrapper(update, *args, **kwargs):
+        trace = Trace(func.__name__)
+        token = _trace.set(trace)
+        try:
+            return await func(update, *args, **kwargs)
+        finally:
+            _trace.reset(token)
+            elapsed = time.perf_counter() - trace.started
+            if elapsed >= SLOW_UPDATE_SECONDS:
+                user = getattr(update, "effective_user", None)
+                LOGGER.warning(
+                    f"Slow update: {trace.name} for user {user.id if user else '?'} took "
+                    f"{elapsed * 1000:.0f} ms\n{breakdown(trace)}"
+                )
+
+    return wrapper
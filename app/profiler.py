@@ -0,0 +1,77 @@
+"""
+On-demand sampling profiler behind an admin-only route. A background thread
+snapshots every thread's stack for a fixed time and the route returns the
+counts as folded stacks, ready for flamegraph.pl or speedscope.
+"""
+import asyncio
+import logging
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from aiohttp import web
+
+LOGGER = logging.getLogger(__name__)
+
+PROFILE_PATH = "/debug/profile"
+# The route is only registered when this is set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+MAX_SECONDS = 60
+DEFAULT_HZ = 100
+MAX_HZ = 1000
+
+_lock = asyncio.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def sample(seconds: float, hz: int) -> Counter:
+    """Blocks for seconds, counting each thread's stack hz times per second."""
+    interval = 1.0 / hz
+    me = threading.get_ident()
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks: Counter = Counter()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.append(names.get(ident, f"thread-{ident}"))
+            stacks[";".join(reversed(labels))] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def folded(stacks: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+async def handle(request: web.Request) -> web.Response:
+    """GET /debug/profile?seconds=10&hz=100 with an "Authorization: Bearer <ADMIN_TOKEN>" header."""
+    if not ADMIN_TOKEN or not secrets.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {ADMIN_TOKEN}"
+    ):
+        return web.Response(status=403)
+    try:
+        seconds = min(float(request.query.get("seconds", 10)), MAX_SECONDS)
+        hz = min(int(request.query.get("hz", DEFAULT_HZ)), MAX_HZ)
+    except ValueError:
+        return web.Response(status=400, text="seconds and hz must be numbers")
+    if seconds <= 0 or hz <= 0:
+        return web.Response(status=400, text="seconds and hz must be positive")
+    if _lock.locked():
+        return web.Response(status=409, text="A profile is already running")
+    async with _lock:
+        LOGGER.info(f"Profiling for {seconds:g}s at {hz} Hz")
+        # The sampler runs in a thread so the event loop keeps serving while it is observed
+        stacks = await asyncio.to_thread(sample, seconds, hz)
+    return web.Response(text=folded(stacks), content_type="text/plain", charset="utf-8")
@@ -0,0 +1,80 @@
+"""
+Webhook ingestion: Telegram POSTs updates to a route on the bot's aiohttp
+server and a fixed pool of workers feeds them to Application.process_update.
+"""
+import asyncio
+import logging
+import os
+import secrets
+from aiohttp import web
+from telegram import Update
+from news import metrics
+
+LOGGER = logging.getLogger(__name__)
+
+WEBHOOK_PATH = "/telegram"
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", 8))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", 256))
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class UpdateQueue:
+    """
+    Bounded queue between the webhook route and the handlers. When it is full
+    the route answers 503 and Telegram redelivers the update later. Updates are
+    processed concurrently, so two updates from one chat may finish out of order.
+    """
+
+    def __init__(self, app, workers: int = UPDATE_WORKERS, maxsize: int = UPDATE_QUEUE_SIZE, secret: str | None = None):
+        self.app = app
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        # Telegram echoes this back on every request; random per boot unless pinned
+        self.secret = secret or secrets.token_urlsafe(32)
+        self._tasks: list[asyncio.Task] = []
+        metrics.Gauge(
+            "newsworthy_update_queue_depth", "Webhook updates waiting for a worker.",
+            callback=lambda: {(): self.queue.qsize()},
+        )
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not secrets.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            return web.Response(status=403)
+        try:
+            update = Update.de_json(await request.json(), self.app.bot)
+        except Exception as e:
+            LOGGER.warning(f"Rejected malformed webhook update: {e}")
+            return web.Response(status=400)
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            LOGGER.warning("Update queue full, asking Telegram to retry.")
+            return web.Response(status=503)
+        return web.Response()
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.app.process_update(update)
+            except Exception as e:
+                LOGGER.error(f"Error processing update {update.update_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def start(self, url: str):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        webhook_url = f"{url.rstrip('/')}{WEBHOOK_PATH}"
+        await self.app.bot.set_webhook(url=webhook_url, secret_token=self.secret, allowed_updates=Update.ALL_TYPES)
+        LOGGER.info(f"Webhook set to {webhook_url} with {self.workers} workers")
+
+    async def stop(self, timeout: float = 10.0):
+        """Lets queued updates finish (up to timeout), then stops the workers."""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            LOGGER.warning(f"Dropping {self.queue.qsize()} queued updates on shutdown.")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
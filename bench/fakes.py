@@ -0,0 +1,330 @@
+"""
+In-process stand-ins for GNews, the storage tables and the Telegram Bot API,
+each with configurable latency and error injection.
+"""
+import asyncio
+import random
+import time
+from datetime import datetime
+from aiohttp import web
+from telegram.error import RetryAfter, NetworkError
+from news.storage import StorageBackend
+
+
+class InjectedError(Exception):
+    pass
+
+
+class Faults:
+    """Latency (seconds) and error probability for one fake service."""
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self.random = random.Random(seed)
+
+    async def io(self):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return True
+        return False
+
+
+class FakeGNews:
+    """Serves /api/v4/search on localhost with overlapping articles per query."""
+
+    def __init__(self, faults: Faults, articles: int = 10):
+        self.faults = faults
+        self.articles = articles
+        self.requests: dict[str, int] = {}
+        self.runner: web.AppRunner | None = None
+        self.endpoint = None
+
+    async def handle(self, request):
+        topic = request.query.get("q", "")
+        self.requests[topic] = self.requests.get(topic, 0) + 1
+        if await self.faults.io():
+            return web.json_response({"errors": ["injected"]}, status=500)
+        batch = self.requests[topic]
+        articles = []
+        for i in range(self.articles):
+            # Half of each batch repeats the previous one, and every topic
+            # shares a "top story" to exercise dedup and clustering.
+            story = f"{topic}-{batch - (i % 2)}-{i}" if i else "top-story"
+            articles.append({
+                "title": f"Headline {story}",
+                "content": f"Full story about {story} with enough words to shingle properly.",
+                "url": f"https://news.example/{story}",
+                "publishedAt": datetime.now().isoformat(),
+            })
+        return web.json_response({"articles": articles})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/api/v4/search", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.endpoint = f"http://127.0.0.1:{port}/api/v4/search"
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    @property
+    def total_requests(self) -> int:
+        return sum(self.requests.values())
+
+
+class FakeBackend(StorageBackend):
+    """The storage tables as in-memory lists and dicts."""
+
+    def __init__(self, faults: Faults):
+        self.faults = faults
+        self.users: dict[int, dict] = {}
+        self.subscriptions: set[tuple[int, str]] = set()
+        self.news: list[dict] = []
+        self.api_usage: dict[str, int] = {}
+        self.leases: dict[str, tuple[str, datetime]] = {}
+        self.replicas: dict[str, datetime] = {}
+        # (slot, user_id) -> {"status", "attempts"}
+        self.deliveries: dict[tuple[datetime, int], dict] = {}
+        self.checkpoints: dict[str, datetime] = {}
+        self.next_id = 1
+
+    async def _io(self):
+        if await self.faults.io():
+            raise InjectedError("injected storage failure")
+
+    async def upsert_user(self, user_id, username):
+        await self._io()
+        self.users.setdefault(user_id, {"delivery_hour": None, "delivery_minute": None})["username"] = username
+
+    async def get_subscriptions(self, user_id):
+        await self._io()
+        return [topic for uid, topic in self.subscriptions if uid == user_id]
+
+    async def add_subscription(self, user_id, topic):
+        await self._io()
+        self.subscriptions.add((user_id, topic))
+
+    async def remove_subscription(self, user_id, topic):
+        await self._io()
+        self.subscriptions.discard((user_id, topic))
+
+    async def set_delivery_time(self, user_id, hour, minute):
+        await self._io()
+        if user_id in self.users:
+            self.users[user_id].update(delivery_hour=hour, delivery_minute=minute)
+
+    async def get_delivery_time(self, user_id):
+        await self._io()
+        user = self.users.get(user_id)
+        return (user["delivery_hour"], user["delivery_minute"]) if user else None
+
+    async def get_users_by_delivery_time(self, hour, minute):
+        await self._io()
+        return [
+            uid for uid, user in self.users.items()
+            if user["delivery_hour"] == hour and user["delivery_minute"] == minute
+        ]
+
+    async def get_all_delivery_times(self):
+        await self._io()
+        return {
+            uid: (user["delivery_hour"], user["delivery_minute"])
+            for uid, user in self.users.items() if user["delivery_hour"] is not None
+        }
+
+    async def get_all_subscriptions(self):
+        await self._io()
+        result: dict[int, set[str]] = {}
+        for uid, topic in self.subscriptions:
+            result.setdefault(uid, set()).add(topic)
+        return result
+
+    async def get_api_usage(self, day):
+        await self._io()
+        return self.api_usage.get(day, 0)
+
+    async def consume_api_request(self, day, limit):
+        await self._io()
+        if self.api_usage.get(day, 0) >= limit:
+            return None
+        self.api_usage[day] = self.api_usage.get(day, 0) + 1
+        return self.api_usage[day]
+
+    async def insert_news(self, rows):
+        await self._io()
+        for row in rows:
+            self.news.append({**row, "id": self.next_id})
+            self.next_id += 1
+
+    async def find_news_urls(self, topic, urls):
+        await self._io()
+        wanted = set(urls)
+        return {row["url"] for row in self.news if row["topic"] == topic and row["url"] in wanted}
+
+    async def touch_news(self, topic, urls, fetched_at):
+        await self._io()
+        wanted = set(urls)
+        for row in self.news:
+            if row["topic"] == topic and row["url"] in wanted:
+                row["fetched_at"] = fetched_at
+
+    async def get_last_fetch_time(self, topic):
+        await self._io()
+        times = [row["fetched_at"] for row in self.news if row["topic"] == topic]
+        return datetime.fromisoformat(max(times)) if times else None
+
+    async def get_latest_news(self, topic, limit):
+        await self._io()
+        rows = sorted(
+            (row for row in self.news if row["topic"] == topic),
+            key=lambda row: row["published_at"] or "", reverse=True,
+        )
+        return [{"title": row["title"], "url": row["url"]} for row in rows[:limit]]
+
+    async def get_recent_news(self, limit):
+        await self._io()
+        rows = sorted(self.news, key=lambda row: row["published_at"] or "", reverse=True)
+        return [
+            {key: row[key] for key in ("title", "content", "url", "topic", "published_at")} for row in rows[:limit]
+        ]
+
+    async def delete_news_older_than(self, cutoff, batch):
+        await self._io()
+        doomed = {row["id"] for row in self.news if row["fetched_at"] < cutoff.isoformat()}
+        doomed = set(list(doomed)[:batch])
+        self.news = [row for row in self.news if row["id"] not in doomed]
+        return len(doomed)
+
+    async def delete_news_beyond(self, topic, keep, batch):
+        await self._io()
+        rows = sorted(
+            (row for row in self.news if row["topic"] == topic),
+            key=lambda row: row["published_at"] or "", reverse=True,
+        )
+        doomed = {row["id"] for row in rows[keep:keep + batch]}
+        self.news = [row for row in self.news if row["id"] not in doomed]
+        return len(doomed)
+
+
+    async def acquire_lease(self, name, holder, expires_at, now):
+        await self._io()
+        current = self.leases.get(name)
+        if current and current[0] != holder and current[1] >= now:
+            return False
+        self.leases[name] = (holder, expires_at)
+        return True
+
+    async def release_lease(self, name, holder):
+        await self._io()
+        if self.leases.get(name, (None,))[0] == holder:
+            del self.leases[name]
+
+    async def heartbeat(self, replica_id, seen_at):
+        await self._io()
+        self.replicas[replica_id] = seen_at
+
+    async def get_live_replicas(self, since):
+        await self._io()
+        return [replica for replica, seen_at in self.replicas.items() if seen_at >= since]
+
+    async def remove_replica(self, replica_id):
+        await self._io()
+        self.replicas.pop(replica_id, None)
+
+    async def get_checkpoint(self, name):
+        await self._io()
+        return self.checkpoints.get(name)
+
+    async def set_checkpoint(self, name, value):
+        await self._io()
+        self.checkpoints[name] = value
+
+    async def enqueue_deliveries(self, slot, user_ids):
+        await self._io()
+        for user_id in user_ids:
+            self.deliveries.setdefault((slot, user_id), {"status": "pending", "attempts": 0, "parts": 0})
+
+    async def get_pending_deliveries(self, since, after, limit):
+        await self._io()
+        keys = sorted(
+            key for key, row in self.deliveries.items()
+            if row["status"] == "pending" and key[0] >= since and (after is None or key > after)
+        )
+        return [
+            {"user_id": user_id, "slot": slot, **{key: self.deliveries[slot, user_id][key] for key in ("attempts", "parts")}}
+            for slot, user_id in keys[:limit]
+        ]
+
+    async def mark_deliveries(self, slot, user_ids, status, attempts=None, parts=None):
+        await self._io()
+        for user_id in user_ids:
+            row = self.deliveries.get((slot, user_id))
+            if row is not None:
+                row["status"] = status
+                if attempts is not None:
+                    row["attempts"] = attempts
+                if parts is not None:
+                    row["parts"] = parts
+
+    async def delete_deliveries_before(self, cutoff, batch):
+        await self._io()
+        doomed = sorted(key for key in self.deliveries if key[0] < cutoff)[:batch]
+        for key in doomed:
+            del self.deliveries[key]
+        return len(doomed)
+
+
+class FakeBot:
+    """Records what would be sent to Telegram; can inject flood waits and network errors."""
+
+    def __init__(self, faults: Faults, retry_after_rate: float = 0.0):
+        self.faults = faults
+        self.retry_after_rate = retry_after_rate
+        self.sent: list[tuple[int, float]] = []
+        self.started = time.perf_counter()
+
+    async def _io(self):
+        if await self.faults.io():
+            raise NetworkError("injected network error")
+        if self.retry_after_rate and self.faults.random.random() < self.retry_after_rate:
+            raise RetryAfter(1)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._io()
+        self.sent.append((chat_id, time.perf_counter() - self.started))
+
+    async def edit_message_text(self, text, chat_id=None, **kwargs):
+        await self._io()
+        self.sent.append((chat_id, time.perf_counter() - self.started))
+
+
+class FakeClock:
+    """Replaces the datetime class in the given modules so now() is controlled."""
+
+    def __init__(self, start: datetime):
+        self.current = start
+
+    def install(self, *modules):
+        clock = self
+
+        class ClockDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return clock.current if tz is None else clock.current.replace(tzinfo=tz)
+
+        for module in modules:
+            module.datetime = ClockDatetime
+
+    def advance(self, delta):
+        self.current += delta
@@ -0,0 +1,109 @@
+"""
+Benchmark and load-test harness.
+
+    python bench/run.py                           # run every scenario
+    python bench/run.py delivery --users 50000    # one scenario, bigger slot
+    python bench/run.py --save v1                 # store results as a baseline
+    python bench/run.py --compare v1              # diff against a baseline
+
+Exits non-zero if a scenario reports a budget overrun (startup import time)
+or a failed check (coordination).
+
+Each scenario runs in its own process so module-level caches don't leak
+between them.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import subprocess
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+APP_DIR = BENCH_DIR.parent / "app"
+BASELINE_DIR = BENCH_DIR / "baselines"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", help="scenarios to run (default: all)")
+    parser.add_argument("--users", type=int, default=10000, help="users in the delivery and day scenarios")
+    parser.add_argument("--callbacks", type=int, default=500, help="concurrent callbacks in cold_burst")
+    parser.add_argument("--hours", type=int, default=24, help="simulated hours in periodic_day")
+    parser.add_argument("--import-budget", type=float, default=1.0, help="seconds allowed to import main in startup")
+    parser.add_argument("--replicas", type=int, default=3, help="bot replicas in sharding")
+    parser.add_argument("--rate", type=float, default=10000, help="delivery messages/second; delivery also reports the duration at Telegram's ~30/s")
+    parser.add_argument("--storage-latency", type=float, default=20, help="ms per storage call")
+    parser.add_argument("--gnews-latency", type=float, default=300, help="ms per GNews request")
+    parser.add_argument("--bot-latency", type=float, default=30, help="ms per Telegram call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability any fake call fails")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="probability a send hits flood control")
+    parser.add_argument("--save", metavar="NAME", help="save results as bench/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare with bench/baselines/NAME.json")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def load_scenarios() -> dict:
+    sys.path[:0] = [str(APP_DIR), str(BENCH_DIR)]
+    from scenarios import SCENARIOS
+    return SCENARIOS
+
+
+def run_child(name: str, options) -> dict:
+    logging.basicConfig(level=logging.ERROR)
+    return asyncio.run(load_scenarios()[name](options))
+
+
+def run_scenario(name: str, argv: list[str]) -> dict:
+    output = subprocess.run(
+        [sys.executable, __file__, *argv, "--child", name],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def print_results(results: dict, baseline: dict | None):
+    for name, metrics in results.items():
+        print(f"\n== {name}")
+        for key, value in metrics.items():
+            line = f"  {key:32} {value:14.4f}" if isinstance(value, float) else f"  {key:32} {value:>14}"
+            old = (baseline or {}).get(name, {}).get(key)
+            if isinstance(old, (int, float)) and old:
+                line += f"   ({(value - old) / old * 100:+.1f}% vs baseline)"
+            print(line)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    options = parse_args(argv)
+    if options.child:
+        print(json.dumps(run_child(options.child, options)))
+        return
+
+    SCENARIOS = load_scenarios()
+    names = options.scenarios or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+    child_argv = [arg for arg in argv if arg not in names]
+
+    results = {name: run_scenario(name, child_argv) for name in names}
+
+    baseline = None
+    if options.compare:
+        baseline = json.loads((BASELINE_DIR / f"{options.compare}.json").read_text())
+    print_results(results, baseline)
+    over = [f"{name}.{key}" for name, metrics in results.items() for key, value in metrics.items()
+            if key.endswith(("over_budget", "failed_checks")) and value]
+    if options.save:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        (BASELINE_DIR / f"{options.save}.json").write_text(json.dumps(results, indent=2, sort_keys=True))
+        print(f"\nSaved baseline to {BASELINE_DIR / options.save}.json")
+    if over:
+        raise SystemExit(f"\nOver budget or failed: {', '.join(over)}")
+
+
+if __name__ == "__main__":
+    main()
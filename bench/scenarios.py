@@ -0,0 +1,335 @@
+"""
+Benchmark scenarios. Each takes the parsed command-line options, runs against
+the fakes and returns a flat dict of metrics.
+"""
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+from news import api, cache, coordination, db, delivery, quota, render, scheduler, snapshot, timetable
+from news.db import NewsTopics
+from news.storage.sqlite_backend import SQLiteBackend
+import handlers
+
+from fakes import Faults, FakeBackend, FakeBot, FakeClock, FakeGNews
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+TOPICS = [topic.value for topic in NewsTopics]
+# Rough popularity of each topic, most popular first
+TOPIC_WEIGHTS = [9, 7, 3, 6, 10, 4, 8, 5, 2]
+
+
+def percentiles(values: list[float], prefix: str) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    return {f"{prefix}_p50": pick(50), f"{prefix}_p95": pick(95), f"{prefix}_p99": pick(99)}
+
+
+def populate_users(backend: FakeBackend, users: int, slots: list[tuple[int, int]], seed: int = 1):
+    rng = random.Random(seed)
+    for user_id in range(1, users + 1):
+        hour, minute = rng.choice(slots)
+        backend.users[user_id] = {"username": f"user{user_id}", "delivery_hour": hour, "delivery_minute": minute}
+        for topic in set(rng.choices(TOPICS, weights=TOPIC_WEIGHTS, k=rng.randint(1, 4))):
+            backend.subscriptions.add((user_id, topic))
+
+
+async def start_services(options) -> tuple[FakeBackend, FakeGNews]:
+    backend = FakeBackend(Faults(options.storage_latency / 1000, options.error_rate))
+    gnews = FakeGNews(Faults(options.gnews_latency / 1000, options.error_rate))
+    await gnews.start()
+    api.ENDPOINT = gnews.endpoint
+    api.NEWS_API_TOKEN = "bench"
+    db.backend = backend
+    await api.open_session()
+    return backend, gnews
+
+
+async def stop_services(gnews: FakeGNews):
+    await api.close_session()
+    await gnews.stop()
+
+
+async def delivery_slot(options) -> dict:
+    """All users share the 08:00 slot; measures send_scheduled_news end to end."""
+    backend, gnews = await start_services(options)
+    clock = FakeClock(datetime(2026, 1, 1, 8, 0))
+    clock.install(scheduler, cache, quota, delivery)
+    telegram_rate = delivery.GLOBAL_RATE
+    delivery.GLOBAL_RATE = options.rate
+    populate_users(backend, options.users, [(8, 0)])
+    await scheduler.load_timetable()
+    bot = FakeBot(Faults(options.bot_latency / 1000, options.error_rate), options.retry_after_rate)
+    storage_calls = backend.faults.calls
+    digests = dict(render.DIGEST_CACHE_STATS)
+
+    started = time.perf_counter()
+    await scheduler.send_scheduled_news(SimpleNamespace(bot=bot))
+    duration = time.perf_counter() - started
+    await stop_services(gnews)
+
+    return {
+        "users": options.users,
+        "messages": len(bot.sent),
+        "rate_msg_s": options.rate,
+        "duration_s": duration,
+        "throughput_msg_s": len(bot.sent) / duration if duration else 0.0,
+        # What the slot takes in production, where the global flood limit dominates
+        "duration_at_telegram_limit_s": max(duration, len(bot.sent) / telegram_rate),
+        "storage_calls": backend.faults.calls - storage_calls,
+        "quota_used": gnews.total_requests,
+        # Users sharing a topic set should share one rendered digest
+        "digest_renders": render.DIGEST_CACHE_STATS["misses"] - digests["misses"],
+        "digest_cache_hits": render.DIGEST_CACHE_STATS["hits"] - digests["hits"],
+        **percentiles([sent_at for _, sent_at in bot.sent], "delivered_after_s"),
+    }
+
+
+def callback_update(user_id: int, data: str, bot: FakeBot):
+    async def answer(*args, **kwargs):
+        pass
+
+    async def edit_message_text(text, **kwargs):
+        await bot.edit_message_text(text, chat_id=user_id, **kwargs)
+
+    user = SimpleNamespace(id=user_id, first_name="Bench", username=f"user{user_id}")
+    query = SimpleNamespace(data=data, from_user=user, answer=answer, edit_message_text=edit_message_text)
+    update = SimpleNamespace(
+        callback_query=query, message=None, effective_user=user, effective_chat=SimpleNamespace(id=user_id)
+    )
+    return update, SimpleNamespace(bot=bot, args=[])
+
+
+async def cold_burst(options) -> dict:
+    """A burst of news: callbacks for one topic with nothing cached."""
+    backend, gnews = await start_services(options)
+    bot = FakeBot(Faults(options.bot_latency / 1000, options.error_rate))
+    latencies = []
+
+    async def tap(user_id):
+        update, context = callback_update(user_id, "news:technology", bot)
+        started = time.perf_counter()
+        try:
+            await handlers.button(update, context)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(tap(i) for i in range(1, options.callbacks + 1)), return_exceptions=True)
+    duration = time.perf_counter() - started
+    await stop_services(gnews)
+
+    return {
+        "callbacks": options.callbacks,
+        "failed": sum(isinstance(result, Exception) for result in results),
+        "duration_s": duration,
+        "throughput_cb_s": options.callbacks / duration if duration else 0.0,
+        "quota_used": gnews.total_requests,
+        "storage_calls": backend.faults.calls,
+        **percentiles(latencies, "latency_s"),
+    }
+
+
+async def periodic_day(options) -> dict:
+    """Simulates a day of periodic_news_update and deliveries on a fake clock."""
+    backend, gnews = await start_services(options)
+    start = datetime(2026, 1, 1, 0, 0)
+    clock = FakeClock(start)
+    clock.install(scheduler, cache, quota, delivery)
+    slots = [(7, 0), (8, 0), (12, 0), (18, 0), (21, 0)]
+    populate_users(backend, options.users, slots)
+    await scheduler.load_timetable()
+    await quota.load()
+
+    staleness = []
+    step = timedelta(minutes=10)
+    end = start + timedelta(hours=options.hours)
+    while clock.current < end:
+        await scheduler.periodic_news_update()
+        slot = (clock.current.hour, clock.current.minute)
+        if slot in slots:
+            due = {topic for uid, topic in backend.subscriptions if backend.users[uid]["delivery_hour"] == slot[0]
+                   and backend.users[uid]["delivery_minute"] == slot[1]}
+            for topic in due:
+                last_fetch = await backend.get_last_fetch_time(topic)
+                if last_fetch:
+                    staleness.append((clock.current - last_fetch).total_seconds() / 60)
+        clock.advance(step)
+    await stop_services(gnews)
+
+    return {
+        "hours": options.hours,
+        "users": options.users,
+        "quota_used": gnews.total_requests,
+        **{f"requests_{topic}": count for topic, count in sorted(gnews.requests.items())},
+        **percentiles(staleness, "staleness_at_delivery_min"),
+        "stored_rows": len(backend.news),
+    }
+
+
+async def sharding(options) -> dict:
+    """How evenly the hash ring splits users, and how many move when a replica dies."""
+    replicas = [f"replica-{i}" for i in range(options.replicas)]
+    ring = coordination.build_ring(replicas)
+    owners = {user_id: coordination.owner(ring, user_id) for user_id in range(1, options.users + 1)}
+    shares = Counter(owners.values())
+    survivors = coordination.build_ring(replicas[1:]) if len(replicas) > 1 else ring
+    moved = sum(coordination.owner(survivors, user_id) != owner for user_id, owner in owners.items())
+    return {
+        "replicas": options.replicas,
+        "users": options.users,
+        "max_share": max(shares.values()) / options.users,
+        "min_share": min(shares.values()) / options.users,
+        "moved_on_failure": moved / options.users,
+        "dead_replica_share": shares[replicas[0]] / options.users,
+    }
+
+
+async def as_replica(replica_id: str, backend: SQLiteBackend, call, *args):
+    """Runs a coordination call as if made by replica_id through its own connection."""
+    coordination.REPLICA_ID = replica_id
+    db.backend = backend
+    return await call(*args)
+
+
+async def coordination_sqlite(options) -> dict:
+    """
+    Two replicas on one SQLite file, each with its own connection: lease
+    contention, takeover after expiry, release, and a stale heartbeat moving
+    users off the ring.
+    """
+    path = os.path.join(tempfile.mkdtemp(), "coordination.db")
+    a, b = SQLiteBackend(path), SQLiteBackend(path)
+    await a.connect()
+    await b.connect()
+    lease, ttl = "bench", timedelta(seconds=0.2)
+    checks = {}
+
+    # Both ask at once; the conditional upsert lets exactly one in
+    won = await asyncio.gather(
+        as_replica("replica-a", a, coordination.hold_lease, lease, ttl),
+        as_replica("replica-b", b, coordination.hold_lease, lease, ttl),
+    )
+    checks["contention_single_holder"] = sum(won) == 1
+    holder, other = ("replica-a", a), ("replica-b", b)
+    if won[1]:
+        holder, other = other, holder
+    checks["holder_renews"] = await as_replica(*holder, coordination.hold_lease, lease, ttl)
+
+    await asyncio.sleep(ttl.total_seconds() * 1.5)
+    checks["takeover_after_expiry"] = await as_replica(*other, coordination.hold_lease, lease, ttl)
+    checks["old_holder_locked_out"] = not await as_replica(*holder, coordination.hold_lease, lease, ttl)
+
+    # A release by a replica that doesn't hold the lease is a no-op
+    await holder[1].release_lease(lease, holder[0])
+    checks["foreign_release_ignored"] = not await as_replica(*holder, coordination.hold_lease, lease, ttl)
+    await other[1].release_lease(lease, other[0])
+    checks["handover_after_release"] = await as_replica(*holder, coordination.hold_lease, lease, ttl)
+
+    users = range(1, options.users + 1)
+    await as_replica("replica-b", b, coordination.heartbeat)
+    await as_replica("replica-a", a, coordination.heartbeat)
+    checks["both_live"] = coordination.replicas() == ["replica-a", "replica-b"]
+    owned_by_b = [user_id for user_id in users if not coordination.owns(user_id)]
+    # replica-b stops heartbeating: its last beat ages past the timeout
+    stale = datetime.now(timezone.utc) - coordination.REPLICA_TIMEOUT - timedelta(seconds=1)
+    await b.heartbeat("replica-b", stale)
+    started = time.perf_counter()
+    await as_replica("replica-a", a, coordination.heartbeat)
+    heartbeat_s = time.perf_counter() - started
+    checks["stale_replica_dropped"] = coordination.replicas() == ["replica-a"]
+    checks["users_moved_to_survivor"] = bool(owned_by_b) and all(coordination.owns(user_id) for user_id in users)
+
+    await a.close()
+    await b.close()
+    return {
+        **{check: int(passed) for check, passed in checks.items()},
+        "users": options.users,
+        "moved_on_failure": len(owned_by_b) / options.users,
+        "heartbeat_s": heartbeat_s,
+        "failed_checks": sum(not passed for passed in checks.values()),
+    }
+
+
+def import_time() -> float:
+    """Seconds to import main in a fresh interpreter."""
+    code = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=APP_DIR, env={**os.environ, "TELEGRAM_TOKEN": "bench"},
+        check=True, capture_output=True, text=True,
+    )
+    return float(output.stdout.split()[-1])
+
+
+def forget_state():
+    """Drops what a restart loses: headline lists and the delivery timetable."""
+    cache._headline_cache.clear()
+    cache._last_good.clear()
+    timetable.replace({}, {})
+    timetable._loaded = False
+
+
+async def startup(options) -> dict:
+    """Import time of main, and the first /news tap after a restart with and without a snapshot."""
+    import_s = min(import_time() for _ in range(3))
+
+    backend, gnews = await start_services(options)
+    populate_users(backend, options.users, [(8, 0)])
+    await scheduler.load_timetable()
+    await cache.fetch_and_store_news(NewsTopics.TECHNOLOGY)
+    path = os.path.join(tempfile.mkdtemp(), "snapshot.json")
+    started = time.perf_counter()
+    snapshot.save(path)
+    save_s = time.perf_counter() - started
+    bot = FakeBot(Faults(options.bot_latency / 1000))
+
+    async def first_tap(restore: bool) -> float:
+        forget_state()
+        if restore:
+            snapshot.load(path)
+        update, context = callback_update(1, "news:technology", bot)
+        started = time.perf_counter()
+        await handlers.button(update, context)
+        elapsed = time.perf_counter() - started
+        # Let the background refresh finish before the next restart
+        await asyncio.gather(*cache._revalidating.values())
+        return elapsed
+
+    cold_s = await first_tap(restore=False)
+    warm_s = await first_tap(restore=True)
+    restored_users = len(timetable.export()[0])
+    await stop_services(gnews)
+
+    return {
+        "import_s": import_s,
+        "import_budget_s": options.import_budget,
+        "import_over_budget": int(import_s > options.import_budget),
+        "snapshot_save_s": save_s,
+        "snapshot_bytes": os.path.getsize(path),
+        "restored_users": restored_users,
+        "first_tap_cold_s": cold_s,
+        "first_tap_warm_s": warm_s,
+    }
+
+
+SCENARIOS = {
+    "delivery": delivery_slot,
+    "cold_burst": cold_burst,
+    "periodic_day": periodic_day,
+    "sharding": sharding,
+    "coordination": coordination_sqlite,
+    "startup": startup,
+}